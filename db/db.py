@@ -1,22 +1,31 @@
 import os
+from functools import lru_cache
+
 from dotenv import load_dotenv
 from sqlmodel import SQLModel, create_engine
 
 # Load environment variables
 load_dotenv(os.getenv("ENVIRONMENT", ".env"))
 
-# Database connection setup
+# Database connection setup; the environment is read once and the URL reused
+@lru_cache(maxsize=1)
 def get_database_url():
     user = os.getenv("POSTGRES_USER", "postgres")
     password = os.getenv("POSTGRES_PASSWORD", "postgres")
     host = os.getenv("POSTGRES_HOST", "localhost")
     port = os.getenv("POSTGRES_PORT", "5432")
     db = os.getenv("POSTGRES_DB", "ccdr-explorer-db")
-    return f"postgresql://{user}:{password}@{host}:{port}/{db}"
+    return f"postgresql+psycopg://{user}:{password}@{host}:{port}/{db}"
 
 
-# Create database engine
-engine = create_engine(get_database_url())
+# Create database engine; the pool is shared by everything importing it
+engine = create_engine(
+    get_database_url(),
+    pool_size=int(os.getenv("POSTGRES_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("POSTGRES_MAX_OVERFLOW", "20")),
+    pool_recycle=int(os.getenv("POSTGRES_POOL_RECYCLE", "1800")),
+    pool_pre_ping=True,
+)
 
 
 # Create all tables
@@ -0,0 +1,66 @@
+from datetime import UTC, datetime
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Connection, text
+
+
+# Vector (ivfflat/hnsw) indexes on the embedding table, with their definitions
+VECTOR_INDEXES_SQL = text(
+    """
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE schemaname = current_schema()
+  AND tablename = 'embedding'
+  AND (indexdef ILIKE '%USING ivfflat%' OR indexdef ILIKE '%USING hnsw%')
+"""
+)
+
+# Text format: vectors are sent as pgvector literals, valid for vector and halfvec columns
+COPY_EMBEDDINGS_SQL = (
+    "COPY embedding (content_data_id, model_name, embedding_vector, created_at) FROM STDIN"
+)
+
+
+def _vector_literal(vector: Sequence[float] | np.ndarray) -> str:
+    """Format a vector in pgvector's text input format."""
+    # tolist() + repr is several times faster than np.array2string and round-trips exactly
+    return "[" + ",".join(map(repr, np.asarray(vector, dtype=np.float64).tolist())) + "]"
+
+
+# Bulk-load embeddings with COPY, rebuilding vector indexes once afterwards
+def bulk_insert_embeddings(
+    conn: Connection,
+    rows: Iterable[Tuple[int, str, Sequence[float] | np.ndarray]],
+) -> int:
+    """COPY (content_data_id, model_name, vector) rows into the embedding table.
+
+    Rows are streamed to the server one at a time, so the input is never held
+    in memory in full. Any ivfflat/hnsw index on the table is dropped before
+    the load and recreated from its original definition afterwards, all within
+    the caller's transaction. Returns the number of rows written.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+
+    vector_indexes: List[Tuple[str, str]] = [
+        (r.indexname, r.indexdef) for r in conn.execute(VECTOR_INDEXES_SQL)
+    ]
+    for index_name, _ in vector_indexes:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+
+    created_at = datetime.now(UTC)
+    count = 0
+    with conn.connection.cursor() as cursor, cursor.copy(COPY_EMBEDDINGS_SQL) as copy:
+        content_data_id, model_name, vector = first
+        copy.write_row((content_data_id, model_name, _vector_literal(vector), created_at))
+        count += 1
+        for content_data_id, model_name, vector in rows:
+            copy.write_row((content_data_id, model_name, _vector_literal(vector), created_at))
+            count += 1
+
+    for _, index_def in vector_indexes:
+        conn.execute(text(index_def))
+    return count
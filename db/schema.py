@@ -5,19 +5,20 @@ from citeproc import Citation, CitationItem
 from citeproc import formatter
 from citeproc.source.json import CiteProcJSON
 from datetime import date, datetime, UTC
-from typing import List, Optional, Dict, Any, Iterable, Tuple, Literal
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple, Literal
 from html import escape
 import bleach
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 from enum import Enum
 from sqlmodel import Field, Relationship, SQLModel, Column
-from sqlmodel import Session
-from sqlalchemy import event
-from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+from sqlalchemy import Index, event
+from sqlalchemy.orm import Session as SASession, selectinload
 from pydantic import HttpUrl, field_validator
 from sqlalchemy.dialects.postgresql import JSONB
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC
 
 
 @dataclass
@@ -143,16 +144,20 @@ def compute_compacted_ranges(numbers: Iterable[int]) -> List[Tuple[int, int]]:
     return ranges
 
 
+@lru_cache(maxsize=4096)
+def _ranges_string(nums: Tuple[int, ...]) -> str:
+    ranges = compute_compacted_ranges(nums)
+    return ",".join([str(a) if a == b else f"{a}-{b}" for a, b in ranges])
+
+
 def list_to_ranges(nums):
     """
     Helper to convert a list of numbers into a string of ranges.
     Used for the `data-pages` attribute on HTML elements.
     """
-    ranges = compute_compacted_ranges(nums or [])
-    parts: List[str] = []
-    for a, b in ranges:
-        parts.append(str(a) if a == b else f"{a}-{b}")
-    return ",".join(parts)
+    # Many nodes share a page list (e.g. every paragraph on one page), so results
+    # are memoised on the input as given; sorting first would cost most of a miss
+    return _ranges_string(tuple(nums or ()))
 
 
 def format_pages_for_citation(numbers: Iterable[int]) -> Optional[str]:
@@ -892,6 +897,21 @@ class Publication(SQLModel, table=True):
         return result
 
 
+# GIN indexes backing the geography filters in services/semantic_search.py.
+# Written with -> so the expressions match the filters' `... ?| :codes` form.
+_geographical = Publication.__table__.c.publication_metadata.op("->")("geographical")
+Index(
+    "ix_publication_iso3_country_codes",
+    _geographical.op("->")("iso3_country_codes"),
+    postgresql_using="gin",
+)
+Index(
+    "ix_publication_geo_aggregates",
+    _geographical.op("->")("aggregates"),
+    postgresql_using="gin",
+)
+
+
 class Document(SQLModel, table=True):
     __table_args__ = {
         "comment": "Contains document metadata and relationships to nodes"
@@ -935,26 +955,27 @@ class Document(SQLModel, table=True):
         back_populates="document", cascade_delete=True
     )
 
-    def to_html(
+    def iter_html(
         self,
         *,
         include_citation_data: bool = False,
         include_node_ids: bool = False,
         separator: str = "\n",
         include_html_wrapper: bool = False,
-        pretty: bool = True,
-    ) -> str:
-        """Render the document as HTML, traversing nodes in DOM order.
+    ) -> Iterator[str]:
+        """Yield the document's (non-prettified) HTML in pieces, one root node at a time.
 
-        This preserves the hierarchical structure using each node's `tag_name` when present.
-        Descriptions may be used as alt text for images, but are never emitted as plain text.
+        Joining the pieces gives exactly to_html(pretty=False); writing them out
+        as they are produced avoids holding the whole document in one string.
         """
         root_nodes: List["Node"] = sorted(
             (n for n in self.nodes if n.parent_id is None),
             key=lambda n: n.sequence_in_parent,
         )
 
-        parts: List[str] = []
+        if include_html_wrapper:
+            yield "<html>\n<body>\n"
+        first = True
         for root in root_nodes:
             html_fragment = root.to_html(
                 include_citation_data=include_citation_data,
@@ -964,10 +985,35 @@ class Document(SQLModel, table=True):
                 pretty=False,
             )
             if html_fragment:
-                parts.append(html_fragment)
+                if not first:
+                    yield separator
+                yield html_fragment
+                first = False
+        if include_html_wrapper:
+            yield "\n</body>\n</html>"
 
-        body = separator.join(p for p in parts if p)
-        result = f"<html>\n<body>\n{body}\n</body>\n</html>" if include_html_wrapper else body
+    def to_html(
+        self,
+        *,
+        include_citation_data: bool = False,
+        include_node_ids: bool = False,
+        separator: str = "\n",
+        include_html_wrapper: bool = False,
+        pretty: bool = True,
+    ) -> str:
+        """Render the document as HTML, traversing nodes in DOM order.
+
+        This preserves the hierarchical structure using each node's `tag_name` when present.
+        Descriptions may be used as alt text for images, but are never emitted as plain text.
+        """
+        result = "".join(
+            self.iter_html(
+                include_citation_data=include_citation_data,
+                include_node_ids=include_node_ids,
+                separator=separator,
+                include_html_wrapper=include_html_wrapper,
+            )
+        )
 
         if pretty:
             soup = BeautifulSoup(result, "html.parser")
@@ -1319,6 +1365,21 @@ class Node(SQLModel, table=True):
             current = current.parent
         return None
 
+    def _load_subtree(self, session: Session) -> None:
+        """Load this node's descendants, with their children and content data.
+
+        to_html walks children and content_data lazily, one query per node; this
+        loads the whole subtree up front in three queries regardless of its size.
+        """
+        cls = type(self)
+        subtree = select(cls.id).where(cls.id == self.id).cte("subtree", recursive=True)
+        subtree = subtree.union_all(select(cls.id).where(cls.parent_id == subtree.c.id))
+        session.exec(
+            select(cls)
+            .where(cls.id.in_(select(subtree.c.id)))
+            .options(selectinload(cls.children), selectinload(cls.content_data))
+        ).all()
+
     @classmethod
     def render_containing_parent_html(
         cls,
@@ -1357,6 +1418,7 @@ class Node(SQLModel, table=True):
             current = current.parent
 
         target: "Node" = container or node
+        target._load_subtree(session)
         return target.to_html(
             include_citation_data=include_citation_data,
             include_node_ids=include_node_ids,
@@ -1403,6 +1465,7 @@ class Node(SQLModel, table=True):
             TagName.OL,
         }
         if tag in direct_container_tags:
+            node._load_subtree(session)
             return node.to_html(
                 include_citation_data=include_citation_data,
                 include_node_ids=include_node_ids,
@@ -1570,7 +1633,8 @@ class Embedding(SQLModel, table=True):
     content_data_id: Optional[int] = Field(
         default=None, foreign_key="contentdata.id", index=True, ondelete="CASCADE"
     )
-    embedding_vector: List[float] = Field(sa_column=Column(Vector(1536)))
+    # Half precision: embeddings and their HNSW index take half the space of vector(1536)
+    embedding_vector: List[float] = Field(sa_column=Column(HALFVEC(1536)))
     model_name: str = Field(max_length=100)
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
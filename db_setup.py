@@ -1,5 +1,5 @@
 from datetime import date
-from sqlmodel import SQLModel, Session, select
+from sqlmodel import SQLModel, Session, select, text
 import numpy as np
 from db.schema import (
     Publication,
@@ -122,13 +122,12 @@ def test_embedding(content_data: ContentData):
     if content_data.id is None:
         raise ValueError("ContentData ID is required")
 
-    # Generate random vector and convert to regular Python float list
-    vector = np.random.rand(384)
-    vector_list = [float(x) for x in vector]  # Convert np.float64 to Python float
+    # pgvector's adapter binds numpy arrays directly, so no per-element conversion
+    vector = np.random.rand(1536).astype(np.float32)
 
     embedding = Embedding(
         content_data_id=content_data.id,
-        embedding_vector=vector_list,
+        embedding_vector=vector,
         model_name="test-embedding-model",
     )
     return embedding
@@ -150,22 +149,20 @@ def test_relation(source_node: Node, target_node: Node):
 def validate_setup():
     """Run all validation tests"""
     with Session(engine) as session:
-        created_objects = []
+        publication_id: int | None = None
         try:
+            # Flush each layer to obtain primary keys; the single commit below is
+            # the only round-trip that waits on a WAL fsync
             # Test Publication
             publication = test_publication()
             session.add(publication)
-            session.commit()
-            session.refresh(publication)
-            created_objects.append(publication)
+            session.flush()
             print("✓ Publication created successfully")
 
             # Test Document
             document = test_document(publication)
             session.add(document)
-            session.commit()
-            session.refresh(document)
-            created_objects.append(document)
+            session.flush()
             print("✓ Document created successfully")
 
             # Test Nodes
@@ -175,25 +172,17 @@ def validate_setup():
                 paragraph_node,
             ) = test_nodes(document)
 
-            # Add nodes to session and commit to get IDs
+            # Add the parent node first to get its ID
             session.add(section_node)
-            session.commit()
-            session.refresh(section_node)
-            created_objects.append(section_node)
+            session.flush()
 
             # Set parent relationships and add remaining nodes
             heading_node.parent_id = section_node.id
             paragraph_node.parent_id = section_node.id
 
-            session.add(heading_node)
-            session.add(paragraph_node)
-            session.commit()
-            session.refresh(heading_node)
-            session.refresh(paragraph_node)
+            session.add_all([heading_node, paragraph_node])
+            session.flush()
 
-            created_objects.extend(
-                [heading_node, paragraph_node]
-            )
             print("✓ Nodes created successfully")
 
             # Test parent-child relationships
@@ -208,37 +197,32 @@ def validate_setup():
             heading_content, paragraph_content = test_content_data(
                 heading_node, paragraph_node
             )
-            session.add(heading_content)
-            session.add(paragraph_content)
-            session.commit()
-            session.refresh(heading_content)
-            session.refresh(paragraph_content)
-            created_objects.extend([heading_content, paragraph_content])
+            session.add_all([heading_content, paragraph_content])
+            session.flush()
             print("✓ ContentData created successfully")
 
             # Test Embedding
             embedding = test_embedding(paragraph_content)
             session.add(embedding)
-            session.commit()
-            session.refresh(embedding)
-            created_objects.append(embedding)
+            session.flush()
             print("✓ Embedding created successfully")
 
             # Test vector array retrieval
             loaded_embedding = session.exec(
                 select(Embedding).where(Embedding.id == embedding.id)
             ).one()
-            assert len(loaded_embedding.embedding_vector) == 384
+            assert loaded_embedding.embedding_vector.dimensions() == 1536
             print("✓ Embedding vector verified")
 
             # Test Relation
             relation = test_relation(heading_node, paragraph_node)
             session.add(relation)
-            session.commit()
-            session.refresh(relation)
-            created_objects.append(relation)
+            session.flush()
             print("✓ Relation created successfully")
 
+            session.commit()
+            publication_id = publication.id
+
             # Test bidirectional relation relationships
             loaded_relation = session.exec(
                 select(Relation).where(Relation.id == relation.id)
@@ -260,10 +244,15 @@ def validate_setup():
             print(f"\n❌ Validation failed: {str(e)}")
             raise
         finally:
-            # Cleanup test data by properly deleting the objects in reverse order
-            for obj in reversed(created_objects):
-                session.delete(obj)
-            session.commit()
+            session.rollback()
+            if publication_id is not None:
+                # Every foreign key cascades, so deleting the publication removes
+                # its documents, nodes, content data, embeddings and relations
+                session.exec(
+                    text("DELETE FROM publication WHERE id = :id"),
+                    params={"id": publication_id},
+                )
+                session.commit()
             print("\nTest data properly cleaned up")
 
 
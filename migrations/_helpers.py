@@ -0,0 +1,61 @@
+"""
+Shared catalog helpers for migration scripts.
+"""
+
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import text
+
+
+# pg_attribute directly rather than information_schema.columns, whose view
+# joins a dozen catalogs plus privilege checks for every probe
+COLUMNS_EXIST_SQL = text(
+    """
+SELECT c.relname AS table_name, a.attname AS column_name
+FROM unnest(CAST(:tables AS text[]), CAST(:columns AS text[])) AS spec(table_name, column_name)
+JOIN pg_namespace n ON n.nspname = :schema
+JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = spec.table_name
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = spec.column_name
+WHERE a.attnum > 0
+  AND NOT a.attisdropped
+"""
+)
+
+
+def columns_exist(
+    conn, specs: Iterable[Tuple[str, str]], schema: str = "public"
+) -> Set[Tuple[str, str]]:
+    """Return the subset of (table, column) pairs in specs that exist in schema."""
+    specs = list(specs)
+    rows = conn.execute(
+        COLUMNS_EXIST_SQL,
+        {
+            "schema": schema,
+            "tables": [table for table, _ in specs],
+            "columns": [column for _, column in specs],
+        },
+    )
+    return {(row.table_name, row.column_name) for row in rows}
+
+
+INVALID_INDEX_SQL = text(
+    """
+SELECT 1
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_namespace n ON n.oid = i.relnamespace
+WHERE n.nspname = :schema AND i.relname = :name AND NOT x.indisvalid
+"""
+)
+
+
+def drop_invalid_index(conn, name: str, schema: str = "public") -> bool:
+    """Drop index name if a failed CREATE INDEX CONCURRENTLY left it INVALID.
+
+    IF NOT EXISTS would otherwise treat the leftover as already built. Expects
+    an AUTOCOMMIT connection. Returns True when an index was dropped.
+    """
+    if not conn.execute(INVALID_INDEX_SQL, {"schema": schema, "name": name}).scalar():
+        return False
+    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {schema}."{name}"'))
+    return True
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Migration: ensure the btree indexes behind per-document content lookups exist.
+
+db/schema.py declares node.document_id, contentdata.node_id (unique) and
+embedding.content_data_id with index=True, but Postgres does not index foreign
+keys on its own, so databases created before those declarations may lack them.
+Without them, deleting or fetching a document's content seq-scans each table.
+
+- Safe to re-run (IF NOT EXISTS; index names match what create_all generates)
+- Built CONCURRENTLY, so the tables stay writable during the build
+- Drops an INVALID index left by a failed concurrent build before retrying
+- Confirmation prompt unless --confirm is passed
+- Optional --dry-run to see what would be executed
+"""
+
+import argparse
+import sys
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.db import engine, get_database_url
+from migrations._helpers import drop_invalid_index
+
+
+# (index name, table, column, unique)
+CONTENT_INDEXES: List[Tuple[str, str, str, bool]] = [
+    ("ix_node_document_id", "node", "document_id", False),
+    ("ix_contentdata_node_id", "contentdata", "node_id", True),
+    ("ix_embedding_content_data_id", "embedding", "content_data_id", False),
+]
+
+
+def create_index_sql(name: str, table: str, column: str, unique: bool) -> str:
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    return f'CREATE {kind} CONCURRENTLY IF NOT EXISTS "{name}" ON public.{table} ({column});'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ensure indexes on node.document_id, contentdata.node_id and embedding.content_data_id"
+    )
+    parser.add_argument("--confirm", action="store_true", help="Skip confirmation prompt")
+    parser.add_argument("--dry-run", action="store_true", help="Print actions without executing")
+    args = parser.parse_args()
+
+    # Show DB target for sanity
+    try:
+        db_url = get_database_url()
+        host_port_db = db_url.split("@")[1] if "@" in db_url else db_url
+        print(f"Target database: {host_port_db}")
+    except Exception as e:
+        print(f"Failed to resolve database URL: {e}")
+        sys.exit(1)
+
+    if args.dry_run:
+        for name, table, column, unique in CONTENT_INDEXES:
+            print(f"Would execute: {create_index_sql(name, table, column, unique)}")
+        return
+
+    if not args.confirm:
+        resp = input(
+            "This will build any missing content lookup indexes concurrently. Continue? (yes/no): "
+        ).strip().lower()
+        if resp not in ("yes", "y"):
+            print("Aborted.")
+            return
+
+    try:
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name, table, column, unique in CONTENT_INDEXES:
+                if drop_invalid_index(conn, name):
+                    print(f"Dropped invalid index public.{name} from an earlier failed build.")
+
+                sql = create_index_sql(name, table, column, unique)
+                print(f"Executing: {sql}")
+                conn.execute(text(sql))
+                print(f"✓ public.{name} exists on {table}({column}).")
+
+    except SQLAlchemyError as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Migration: add GIN indexes on publication's geographical metadata arrays.
+
+services/semantic_search.py filters publications with
+publication_metadata->'geographical'->'iso3_country_codes' ?| :codes (and the
+same for 'aggregates'). A GIN index on each expression lets Postgres answer
+those filters from the index instead of unnesting every publication's arrays.
+db/schema.py declares the same indexes so create_all builds them on new
+databases.
+
+- Safe to re-run (IF NOT EXISTS)
+- Built CONCURRENTLY, so publication stays writable during the build
+- Drops an INVALID index left by a failed concurrent build before retrying
+- Confirmation prompt unless --confirm is passed
+- Optional --dry-run to see what would be executed
+"""
+
+import argparse
+import sys
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.db import engine, get_database_url
+from migrations._helpers import drop_invalid_index
+
+
+# (index name, key under publication_metadata->'geographical')
+GEOGRAPHY_INDEXES: List[Tuple[str, str]] = [
+    ("ix_publication_iso3_country_codes", "iso3_country_codes"),
+    ("ix_publication_geo_aggregates", "aggregates"),
+]
+
+
+def create_index_sql(name: str, key: str) -> str:
+    # Default jsonb_ops: jsonb_path_ops does not support the ?| operator
+    return (
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON public.publication '
+        f"USING gin (((publication_metadata -> 'geographical') -> '{key}'));"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add GIN indexes on publication geographical metadata arrays"
+    )
+    parser.add_argument("--confirm", action="store_true", help="Skip confirmation prompt")
+    parser.add_argument("--dry-run", action="store_true", help="Print actions without executing")
+    args = parser.parse_args()
+
+    # Show DB target for sanity
+    try:
+        db_url = get_database_url()
+        host_port_db = db_url.split("@")[1] if "@" in db_url else db_url
+        print(f"Target database: {host_port_db}")
+    except Exception as e:
+        print(f"Failed to resolve database URL: {e}")
+        sys.exit(1)
+
+    if args.dry_run:
+        for name, key in GEOGRAPHY_INDEXES:
+            print(f"Would execute: {create_index_sql(name, key)}")
+        return
+
+    if not args.confirm:
+        resp = input(
+            "This will build GIN indexes on publication geographical metadata concurrently. Continue? (yes/no): "
+        ).strip().lower()
+        if resp not in ("yes", "y"):
+            print("Aborted.")
+            return
+
+    try:
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name, key in GEOGRAPHY_INDEXES:
+                if drop_invalid_index(conn, name):
+                    print(f"Dropped invalid index public.{name} from an earlier failed build.")
+
+                sql = create_index_sql(name, key)
+                print(f"Executing: {sql}")
+                conn.execute(text(sql))
+                print(f"✓ public.{name} exists.")
+
+    except SQLAlchemyError as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,6 @@ from __future__ import annotations
 
 import argparse
 from sqlalchemy import text
-from sqlmodel import Session
 
 from db.db import engine, get_database_url
 
@@ -59,9 +58,8 @@ def main() -> None:
             print("Aborted.")
             return
 
-    with Session(engine) as session:
-        session.exec(text(SQL))
-        session.commit()
+    with engine.begin() as conn:
+        conn.execute(text(SQL))
         print(
             "Completed: ensured column 'metadata' (JSONB) exists on table 'publication'."
         )
@@ -5,43 +5,186 @@ Migration: Aggregate Node.positional_data to one bbox per page.
 For each Node, consolidate positional_data entries that share the same page_pdf
 into a single bounding rectangle per page using min(x1,y1) and max(x2,y2).
 
+By default the aggregation runs entirely inside PostgreSQL as a single
+UPDATE over jsonb_array_elements, so no positional_data is shipped to Python.
+Rows still holding string-encoded JSON are left untouched by the SQL path and
+reported as skipped; run again with --legacy to normalize them in Python.
+
 Features:
 - Safe to re-run (idempotent): only updates rows whose aggregated value differs
 - Confirmation prompt unless --confirm is passed
 - Optional --dry-run to preview changes without writing
 - Optional --document-id to limit to a single document
+- Optional --legacy to use the row-by-row Python implementation
+- Optional --workers N to run the --legacy path over documents in N processes
+  (nodes without a document_id are not visited in that mode)
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import multiprocessing
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import update
+import numpy as np
+import orjson
+from psycopg.types.json import Jsonb
+from sqlalchemy import Connection, text
 from sqlalchemy.exc import SQLAlchemyError
-from sqlmodel import Session, select
+from sqlmodel import select
 
 from db.db import engine, get_database_url
 from db.schema import Node
 
 
+# Number of rows fetched per round-trip from the server-side cursor
+STREAM_CHUNK_SIZE = 1000
+
+# Number of changed rows to accumulate before issuing one batched UPDATE
+UPDATE_BATCH_SIZE = 5000
+
+BATCH_UPDATE_SQL = text(
+    """
+UPDATE node
+SET positional_data = data.pd
+FROM (
+    SELECT UNNEST(CAST(:ids AS int[])) AS id,
+           UNNEST(CAST(:pds AS jsonb[])) AS pd
+) AS data
+WHERE node.id = data.id
+"""
+)
+
+
+# Matches the numeric strings accepted by float(); jsonb numbers render the same way via ->>
+_NUMERIC_RE = r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$"
+
+# Shared CTEs: expand each node's entries, group by page and re-assemble the array.
+# Rows that are (or contain) string-encoded JSON are excluded from `target` and
+# counted separately, since PostgreSQL cannot parse them without risking an error.
+_AGGREGATE_CTES = f"""
+WITH scoped AS (
+    SELECT n.id, n.positional_data
+    FROM node n
+    WHERE (CAST(:document_id AS integer) IS NULL OR n.document_id = :document_id)
+),
+target AS (
+    SELECT s.id,
+           CASE jsonb_typeof(s.positional_data)
+               WHEN 'object' THEN jsonb_build_array(s.positional_data)
+               ELSE s.positional_data
+           END AS elems
+    FROM scoped s
+    WHERE jsonb_typeof(s.positional_data) IN ('array', 'object')
+      AND NOT EXISTS (
+          SELECT 1
+          FROM jsonb_array_elements(
+              CASE jsonb_typeof(s.positional_data)
+                  WHEN 'array' THEN s.positional_data
+                  ELSE '[]'::jsonb
+              END
+          ) AS el(e)
+          WHERE jsonb_typeof(el.e) = 'string'
+      )
+),
+pages AS (
+    SELECT t.id,
+           trunc((x.e->>'page_pdf')::numeric)::int AS page_pdf,
+           (array_agg(x.e->>'page_logical' ORDER BY x.ord)
+                FILTER (WHERE x.e->>'page_logical' IS NOT NULL))[1] AS page_logical,
+           min((x.e->'bbox'->>'x1')::float8) AS x1,
+           min((x.e->'bbox'->>'y1')::float8) AS y1,
+           max((x.e->'bbox'->>'x2')::float8) AS x2,
+           max((x.e->'bbox'->>'y2')::float8) AS y2
+    FROM target t
+    CROSS JOIN LATERAL jsonb_array_elements(t.elems) WITH ORDINALITY AS x(e, ord)
+    WHERE jsonb_typeof(x.e) = 'object'
+      AND jsonb_typeof(x.e->'bbox') = 'object'
+      AND x.e->>'page_pdf' ~ '{_NUMERIC_RE}'
+      AND x.e->'bbox'->>'x1' ~ '{_NUMERIC_RE}'
+      AND x.e->'bbox'->>'y1' ~ '{_NUMERIC_RE}'
+      AND x.e->'bbox'->>'x2' ~ '{_NUMERIC_RE}'
+      AND x.e->'bbox'->>'y2' ~ '{_NUMERIC_RE}'
+    GROUP BY t.id, 2
+),
+agg AS (
+    SELECT t.id,
+           COALESCE(
+               jsonb_agg(
+                   jsonb_build_object(
+                       'page_pdf', p.page_pdf,
+                       'page_logical', p.page_logical,
+                       'bbox', jsonb_build_object('x1', p.x1, 'y1', p.y1, 'x2', p.x2, 'y2', p.y2)
+                   )
+                   ORDER BY p.page_pdf
+               ) FILTER (WHERE p.id IS NOT NULL),
+               '[]'::jsonb
+           ) AS pd
+    FROM target t
+    LEFT JOIN pages p ON p.id = t.id
+    GROUP BY t.id
+)"""
+
+AGGREGATE_UPDATE_SQL = text(
+    _AGGREGATE_CTES
+    + """,
+updated AS (
+    UPDATE node
+    SET positional_data = agg.pd
+    FROM agg
+    WHERE node.id = agg.id
+      AND node.positional_data IS DISTINCT FROM agg.pd
+    RETURNING node.id
+)
+SELECT
+    (SELECT count(*) FROM scoped) AS scanned,
+    (SELECT count(*) FROM updated) AS updated,
+    (SELECT count(*) FROM scoped WHERE jsonb_typeof(positional_data) = 'string'
+        OR id NOT IN (SELECT id FROM target)
+           AND jsonb_typeof(positional_data) = 'array') AS skipped
+"""
+)
+
+AGGREGATE_PREVIEW_SQL = text(
+    _AGGREGATE_CTES
+    + """
+SELECT
+    (SELECT count(*) FROM scoped) AS scanned,
+    (SELECT count(*)
+     FROM agg JOIN scoped s ON s.id = agg.id
+     WHERE s.positional_data IS DISTINCT FROM agg.pd) AS updated,
+    (SELECT count(*) FROM scoped WHERE jsonb_typeof(positional_data) = 'string'
+        OR id NOT IN (SELECT id FROM target)
+           AND jsonb_typeof(positional_data) = 'array') AS skipped
+"""
+)
+
+
 def _safe_json_loads(value: str) -> Any:
     """Attempt to parse a JSON string, handling double-encoded cases.
 
     Returns the parsed object on success; otherwise returns the original string.
     """
     try:
-        parsed = json.loads(value)
-        # Handle double-encoded JSON strings (a JSON string that itself contains JSON)
-        if isinstance(parsed, str):
-            try:
-                return json.loads(parsed)
-            except Exception:
-                return parsed
+        parsed = orjson.loads(value)
+    except orjson.JSONDecodeError:
+        # orjson is strict; fall back to json for lenient inputs such as NaN literals
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return value
+    # Only a payload that opens with a quote can be a double-encoded JSON string
+    head = value[:1]
+    if head != '"' and not head.isspace():
         return parsed
-    except Exception:
-        return value
+    # Handle double-encoded JSON strings (a JSON string that itself contains JSON)
+    if isinstance(parsed, str):
+        try:
+            return orjson.loads(parsed)
+        except orjson.JSONDecodeError:
+            return parsed
+    return parsed
 
 
 def _normalize_positional_list(raw: Any) -> List[Dict[str, Any]]:
@@ -105,6 +248,13 @@ def _to_float(value: Any) -> Optional[float]:
     return None
 
 
+def _bbox_coords(bbox: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """Return (x1, y1, x2, y2) as floats, using NaN for missing or invalid values."""
+    values = [_to_float(bbox.get(key)) for key in ("x1", "y1", "x2", "y2")]
+    x1, y1, x2, y2 = (np.nan if v is None else v for v in values)
+    return x1, y1, x2, y2
+
+
 def _aggregate_positional_data_by_page(
     pos_list: List[Dict[str, Any]]
 ) -> List[Dict[str, Any]]:
@@ -127,46 +277,35 @@ def _aggregate_positional_data_by_page(
 
     aggregated: List[Dict[str, Any]] = []
     for page_pdf, group in by_page.items():
-        xs1: List[float] = []
-        ys1: List[float] = []
-        xs2: List[float] = []
-        ys2: List[float] = []
-
-        page_logical: Optional[str] = None
-
-        for p in group:
-            bbox = p.get("bbox") or {}
-            x1 = _to_float(bbox.get("x1"))
-            y1 = _to_float(bbox.get("y1"))
-            x2 = _to_float(bbox.get("x2"))
-            y2 = _to_float(bbox.get("y2"))
-
-            if x1 is None or y1 is None or x2 is None or y2 is None:
-                continue
-
-            xs1.append(x1)
-            ys1.append(y1)
-            xs2.append(x2)
-            ys2.append(y2)
-
-            if page_logical is None:
-                pl = p.get("page_logical")
-                if pl is not None:
-                    page_logical = str(pl)
-
-        if not xs1:
+        # One (x1, y1, x2, y2) row per entry; unparseable coordinates become NaN
+        coords = np.fromiter(
+            (_bbox_coords(p.get("bbox") or {}) for p in group),
+            dtype=np.dtype((np.float64, 4)),
+            count=len(group),
+        )
+        valid = np.isfinite(coords).all(axis=1)
+        if not valid.any():
             # No valid bbox in this group
             continue
 
+        page_logical: Optional[str] = None
+        for p, ok in zip(group, valid):
+            if ok and p.get("page_logical") is not None:
+                page_logical = str(p.get("page_logical"))
+                break
+
+        boxes = coords[valid]
+        x1, y1 = boxes[:, :2].min(axis=0)
+        x2, y2 = boxes[:, 2:].max(axis=0)
         aggregated.append(
             {
                 "page_pdf": page_pdf,
                 "page_logical": page_logical,
                 "bbox": {
-                    "x1": min(xs1),
-                    "y1": min(ys1),
-                    "x2": max(xs2),
-                    "y2": max(ys2),
+                    "x1": float(x1),
+                    "y1": float(y1),
+                    "x2": float(x2),
+                    "y2": float(y2),
                 },
             }
         )
@@ -177,29 +316,61 @@ def _aggregate_positional_data_by_page(
 
 def _json_equal(a: Any, b: Any) -> bool:
     """Compare two JSON-like values for semantic equality."""
-    try:
-        return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
-    except Exception:
-        return a == b
+    # Structural comparison stops at the first difference and serializes nothing;
+    # like jsonb equality it treats 1 and 1.0 as the same number
+    return a == b
 
 
-def _iter_target_nodes(session: Session, document_id: Optional[int]) -> Iterable[Tuple[int, Any]]:
+def _iter_target_nodes(conn: Connection, document_id: Optional[int]) -> Iterable[Tuple[int, Any]]:
     stmt = select(Node.id, Node.positional_data)
     if document_id is not None:
         stmt = stmt.where(Node.document_id == document_id)
     # We do not add an IS NOT NULL filter to also normalize string/invalid forms
-    for node_id, pd in session.exec(stmt):
-        yield node_id, pd
+    # Stream through a server-side cursor so only one window of rows is held in memory
+    result = conn.execute(
+        stmt,
+        execution_options={"stream_results": True, "yield_per": STREAM_CHUNK_SIZE},
+    )
+    for rows in result.partitions():
+        for node_id, pd in rows:
+            yield node_id, pd
+
+
+def _flush_updates(conn: Connection, pending: List[Tuple[int, List[Dict[str, Any]]]]) -> None:
+    """Write all pending aggregated values in a single UPDATE round-trip."""
+    if not pending:
+        return
+    conn.execute(
+        BATCH_UPDATE_SQL,
+        {
+            "ids": [node_id for node_id, _ in pending],
+            "pds": [Jsonb(pd, dumps=orjson.dumps) for _, pd in pending],
+        },
+    )
+    pending.clear()
+
+
+def aggregate_migration_sql(
+    document_id: Optional[int], dry_run: bool
+) -> Tuple[int, int, int, int]:
+    """Run aggregation inside PostgreSQL and return (scanned, updated, unchanged, skipped)."""
+    stmt = AGGREGATE_PREVIEW_SQL if dry_run else AGGREGATE_UPDATE_SQL
+    with engine.begin() as conn:
+        row = conn.execute(stmt, {"document_id": document_id}).one()
+    scanned, updated, skipped = int(row.scanned), int(row.updated), int(row.skipped)
+    return scanned, updated, scanned - updated - skipped, skipped
 
 
 def aggregate_migration(document_id: Optional[int], dry_run: bool) -> Tuple[int, int, int]:
-    """Run aggregation and return (scanned, updated, unchanged)."""
+    """Run aggregation row by row in Python and return (scanned, updated, unchanged)."""
     scanned = 0
     updated = 0
     unchanged = 0
+    pending: List[Tuple[int, List[Dict[str, Any]]]] = []
 
-    with Session(engine) as session:
-        for node_id, pd_raw in _iter_target_nodes(session, document_id):
+    # No ORM objects are loaded, so a plain transaction suffices; it commits on exit
+    with engine.begin() as conn:
+        for node_id, pd_raw in _iter_target_nodes(conn, document_id):
             scanned += 1
             original_list = _normalize_positional_list(pd_raw)
             aggregated_list = _aggregate_positional_data_by_page(original_list)
@@ -212,20 +383,52 @@ def aggregate_migration(document_id: Optional[int], dry_run: bool) -> Tuple[int,
                 updated += 1
                 continue
 
-            stmt = (
-                update(Node)
-                .where(Node.id == node_id)
-                .values(positional_data=aggregated_list)
-            )
-            session.exec(stmt)
+            pending.append((node_id, aggregated_list))
             updated += 1
+            if len(pending) >= UPDATE_BATCH_SIZE:
+                _flush_updates(conn, pending)
 
         if not dry_run:
-            session.commit()
+            _flush_updates(conn, pending)
 
     return scanned, updated, unchanged
 
 
+def _init_worker() -> None:
+    # Forked workers must not reuse the parent's pooled connections
+    engine.dispose(close=False)
+
+
+def _aggregate_document(task: Tuple[int, bool]) -> Tuple[int, int, int]:
+    document_id, dry_run = task
+    return aggregate_migration(document_id=document_id, dry_run=dry_run)
+
+
+def aggregate_migration_parallel(workers: int, dry_run: bool) -> Tuple[int, int, int]:
+    """Run the Python aggregation with one task per document across worker processes.
+
+    Each document is committed independently. Returns (scanned, updated, unchanged).
+    """
+    with engine.connect() as conn:
+        document_ids = list(
+            conn.execute(
+                select(Node.document_id)
+                .where(Node.document_id.is_not(None))
+                .distinct()
+            ).scalars()
+        )
+    engine.dispose()
+
+    scanned = updated = unchanged = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        tasks = [(document_id, dry_run) for document_id in document_ids]
+        for s, u, c in pool.imap_unordered(_aggregate_document, tasks):
+            scanned += s
+            updated += u
+            unchanged += c
+    return scanned, updated, unchanged
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Aggregate Node.positional_data to one bbox per page"
@@ -246,8 +449,25 @@ def main() -> None:
         action="store_true",
         help="Skip confirmation prompt",
     )
+    parser.add_argument(
+        "--legacy",
+        action="store_true",
+        help="Aggregate in Python instead of SQL (also normalizes string-encoded JSON)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="With --legacy, number of processes to spread documents across",
+    )
 
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and not args.legacy:
+        parser.error("--workers only applies to --legacy; the SQL path runs in one statement")
+    if args.workers > 1 and args.document_id is not None:
+        parser.error("--workers cannot be combined with --document-id")
 
     # Show DB target for sanity
     try:
@@ -272,13 +492,32 @@ def main() -> None:
             return
 
     try:
-        scanned, updated, unchanged = aggregate_migration(
+        mode = "(dry-run) " if args.dry_run else ""
+        if args.legacy:
+            if args.workers > 1:
+                scanned, updated, unchanged = aggregate_migration_parallel(
+                    workers=args.workers, dry_run=args.dry_run
+                )
+            else:
+                scanned, updated, unchanged = aggregate_migration(
+                    document_id=args.document_id, dry_run=args.dry_run
+                )
+            print(
+                f"{mode}Completed aggregation. Scanned: {scanned}, Updated: {updated}, Unchanged: {unchanged}"
+            )
+            return
+
+        scanned, updated, unchanged, skipped = aggregate_migration_sql(
             document_id=args.document_id, dry_run=args.dry_run
         )
-        mode = "(dry-run) " if args.dry_run else ""
         print(
-            f"{mode}Completed aggregation. Scanned: {scanned}, Updated: {updated}, Unchanged: {unchanged}"
+            f"{mode}Completed aggregation. Scanned: {scanned}, Updated: {updated}, "
+            f"Unchanged: {unchanged}, Skipped: {skipped}"
         )
+        if skipped:
+            print(
+                f"{skipped} row(s) hold string-encoded JSON the SQL path does not parse; use --legacy for those."
+            )
     except SQLAlchemyError as e:
         print(f"Migration failed: {e}")
         raise
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Migration: ensure ON DELETE CASCADE on contentdata.node_id and embedding.content_data_id.
+
+db/schema.py declares both foreign keys with ondelete="CASCADE", but databases
+created before that was added may still carry NO ACTION constraints. Deleting a
+document's content then needs manual child-first deletes instead of a single
+DELETE on contentdata.
+
+- Safe to re-run (skips constraints that already cascade)
+- The replacement constraint is added NOT VALID and validated in a second
+  transaction, so the table scan does not run under the ALTER TABLE lock
+- Confirmation prompt unless --confirm is passed
+- Optional --dry-run to see what would be executed
+"""
+
+import argparse
+import sys
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.db import engine, get_database_url
+
+
+# (table, column, referenced table)
+CASCADE_FKS: List[Tuple[str, str, str]] = [
+    ("contentdata", "node_id", "node"),
+    ("embedding", "content_data_id", "contentdata"),
+]
+
+FIND_FK_SQL = text(
+    """
+SELECT con.conname, con.confdeltype
+FROM pg_constraint con
+JOIN pg_class t ON t.oid = con.conrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = con.conkey[1]
+WHERE con.contype = 'f'
+  AND n.nspname = 'public'
+  AND t.relname = :table
+  AND a.attname = :column
+  AND cardinality(con.conkey) = 1
+LIMIT 1
+"""
+)
+
+
+def find_fk(conn, table: str, column: str) -> Optional[Tuple[str, str]]:
+    """Return (constraint name, confdeltype) of the FK on table.column, if any."""
+    row = conn.execute(FIND_FK_SQL, {"table": table, "column": column}).first()
+    return (row.conname, row.confdeltype) if row else None
+
+
+def replace_fk_sql(table: str, column: str, ref_table: str, existing: Optional[str]) -> str:
+    name = existing or f"{table}_{column}_fkey"
+    drop = f'DROP CONSTRAINT "{existing}", ' if existing else ""
+    return (
+        f'ALTER TABLE public.{table} {drop}ADD CONSTRAINT "{name}" '
+        f"FOREIGN KEY ({column}) REFERENCES public.{ref_table}(id) ON DELETE CASCADE NOT VALID;"
+    )
+
+
+def validate_fk_sql(table: str, column: str, existing: Optional[str]) -> str:
+    name = existing or f"{table}_{column}_fkey"
+    return f'ALTER TABLE public.{table} VALIDATE CONSTRAINT "{name}";'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ensure ON DELETE CASCADE on contentdata.node_id and embedding.content_data_id"
+    )
+    parser.add_argument("--confirm", action="store_true", help="Skip confirmation prompt")
+    parser.add_argument("--dry-run", action="store_true", help="Print actions without executing")
+    args = parser.parse_args()
+
+    # Show DB target for sanity
+    try:
+        db_url = get_database_url()
+        host_port_db = db_url.split("@")[1] if "@" in db_url else db_url
+        print(f"Target database: {host_port_db}")
+    except Exception as e:
+        print(f"Failed to resolve database URL: {e}")
+        sys.exit(1)
+
+    if not args.confirm and not args.dry_run:
+        resp = input(
+            "This will recreate the contentdata/embedding foreign keys with ON DELETE CASCADE. Continue? (yes/no): "
+        ).strip().lower()
+        if resp not in ("yes", "y"):
+            print("Aborted.")
+            return
+
+    try:
+        for table, column, ref_table in CASCADE_FKS:
+            with engine.begin() as conn:
+                fk = find_fk(conn, table, column)
+                if fk and fk[1] == "c":
+                    print(f"No-op: public.{table}.{column} already cascades ({fk[0]}).")
+                    continue
+
+                existing = fk[0] if fk else None
+                replace_sql = replace_fk_sql(table, column, ref_table, existing)
+                validate_sql = validate_fk_sql(table, column, existing)
+                if args.dry_run:
+                    print(f"Would execute: {replace_sql}")
+                    print(f"Would execute: {validate_sql}")
+                    continue
+
+                print(f"Executing: {replace_sql}")
+                conn.execute(text(replace_sql))
+
+            # Validate separately: only a SHARE UPDATE EXCLUSIVE lock during the scan
+            with engine.begin() as conn:
+                print(f"Executing: {validate_sql}")
+                conn.execute(text(validate_sql))
+            print(f"✓ public.{table}.{column} now references {ref_table}(id) ON DELETE CASCADE.")
+
+    except SQLAlchemyError as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,7 @@
-import os
+from sqlalchemy import text
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-
-# Load environment from .env by default
-load_dotenv(os.getenv("ENVIRONMENT", ".env"))
-
-
-def get_database_url() -> str:
-    user = os.getenv("POSTGRES_USER", "postgres")
-    password = os.getenv("POSTGRES_PASSWORD", "postgres")
-    host = os.getenv("POSTGRES_HOST", "localhost")
-    port = os.getenv("POSTGRES_PORT", "5432")
-    db = os.getenv("POSTGRES_DB", "ccdr-explorer-db")
-    return f"postgresql://{user}:{password}@{host}:{port}/{db}"
+from db.db import engine
+from migrations._helpers import drop_invalid_index
 
 
 def _fetch_scalar(conn, sql: str, **params):
@@ -64,21 +52,76 @@ def get_column_type(conn) -> str:
     return row[0] if row else ""
 
 
-def convert_array_to_vector(conn, dims: int) -> None:
-    # Use USING cast to convert float8[] -> vector(dims)
-    conn.execute(text(f"ALTER TABLE embedding ALTER COLUMN embedding_vector TYPE vector({dims}) USING (embedding_vector::vector({dims}))"))
+def drop_embedding_vector_indexes(conn) -> list[str]:
+    # Indexes on the column would otherwise be rebuilt synchronously by the ALTER
+    rows = _fetch_all(
+        conn,
+        """
+        SELECT DISTINCT i.relname
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(x.indkey)
+        WHERE n.nspname = 'public' AND t.relname = 'embedding' AND a.attname = 'embedding_vector'
+        """,
+    )
+    names = [r[0] for r in rows]
+    for name in names:
+        conn.execute(text(f'DROP INDEX IF EXISTS public."{name}"'))
+    return names
+
+
+def convert_array_to_vector(dims: int, batch_size: int = 10_000) -> None:
+    # Convert float8[] -> vector(dims) without an ALTER ... TYPE table rewrite:
+    # backfill a new column in short transactions, then swap it in under a brief lock.
+    # Re-running after an interruption resumes from the rows not yet backfilled.
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE embedding ADD COLUMN IF NOT EXISTS embedding_vector_v2 vector({dims})"))
+        lo_id, hi_id = conn.execute(text("SELECT MIN(id), MAX(id) FROM embedding")).one()
+
+    if lo_id is not None:
+        for lo in range(int(lo_id), int(hi_id) + 1, batch_size):
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        f"""
+                        UPDATE embedding
+                        SET embedding_vector_v2 = embedding_vector::vector({dims})
+                        WHERE id BETWEEN :lo AND :hi
+                          AND embedding_vector_v2 IS NULL
+                          AND embedding_vector IS NOT NULL
+                        """
+                    ),
+                    {"lo": lo, "hi": lo + batch_size - 1},
+                )
+            print(f"  backfilled ids {lo}..{min(lo + batch_size - 1, int(hi_id))}")
+
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE embedding IN ACCESS EXCLUSIVE MODE"))
+        # Catch rows inserted while the backfill was running
+        conn.execute(text(
+            f"UPDATE embedding SET embedding_vector_v2 = embedding_vector::vector({dims}) "
+            "WHERE embedding_vector_v2 IS NULL AND embedding_vector IS NOT NULL"
+        ))
+        conn.execute(text("ALTER TABLE embedding DROP COLUMN embedding_vector"))
+        conn.execute(text("ALTER TABLE embedding RENAME COLUMN embedding_vector_v2 TO embedding_vector"))
 
 
 def create_vector_index(conn, index_name: str = "embedding_vec_cosine_ivfflat", use_hnsw: bool = False) -> None:
-    # Try to give the builder more room within the transaction
+    # Expects an AUTOCOMMIT connection: CONCURRENTLY cannot run inside a transaction
+    # block, and it keeps the table writable for the duration of the build.
+    # Give the builder more room for this session
     try:
-        conn.execute(text("SET LOCAL maintenance_work_mem = '256MB'"))
+        conn.execute(text("SET maintenance_work_mem = '256MB'"))
     except Exception:
         pass
 
+    drop_invalid_index(conn, index_name)
+
     if use_hnsw:
         conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS " + index_name + " ON embedding USING hnsw (embedding_vector vector_cosine_ops) WITH (m = 16, ef_construction = 200)"
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS " + index_name + " ON embedding USING hnsw (embedding_vector vector_cosine_ops) WITH (m = 16, ef_construction = 200)"
         ))
         return
 
@@ -86,12 +129,14 @@ def create_vector_index(conn, index_name: str = "embedding_vec_cosine_ivfflat",
     last_err: Exception | None = None
     for lists in (100, 80, 64, 48, 32):
         try:
+            # DDL cannot take bind parameters, so the (integer) list count is inlined
             conn.execute(text(
-                "CREATE INDEX IF NOT EXISTS " + index_name + " ON embedding USING ivfflat (embedding_vector vector_cosine_ops) WITH (lists = :lists)"
-            ), {"lists": lists})
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS " + index_name + f" ON embedding USING ivfflat (embedding_vector vector_cosine_ops) WITH (lists = {int(lists)})"
+            ))
             return
         except Exception as exc:  # e.g., ProgramLimitExceeded (maintenance_work_mem)
             last_err = exc
+            drop_invalid_index(conn, index_name)
             continue
     if last_err:
         raise last_err
@@ -103,8 +148,8 @@ def postcheck_counts(conn, before_count: int) -> None:
         raise RuntimeError(f"Row count mismatch after conversion: before={before_count}, after={after_count}")
 
 
-def main(expected_dims: int = 1536, use_hnsw: bool = False) -> None:
-    engine = create_engine(get_database_url())
+def main(expected_dims: int = 1536, use_hnsw: bool = False, batch_size: int = 10_000) -> None:
+    needs_conversion = False
     with engine.begin() as conn:
         before_count = int(_fetch_scalar(conn, "SELECT COUNT(*) FROM embedding") or 0)
 
@@ -123,18 +168,31 @@ def main(expected_dims: int = 1536, use_hnsw: bool = False) -> None:
             print("Column already uses pgvector; skipping type conversion.")
         else:
             precheck_dimensions_array(conn, expected_dims)
-            print(f"Converting embedding_vector to vector({expected_dims})...")
-            convert_array_to_vector(conn, expected_dims)
-
-        print("Ensuring ANN index on embedding_vector (cosine) exists...")
-        create_vector_index(conn, use_hnsw=use_hnsw)
+            dropped = drop_embedding_vector_indexes(conn)
+            if dropped:
+                print(f"Dropped indexes on embedding_vector before conversion: {', '.join(dropped)}")
+            needs_conversion = True
+
+    if needs_conversion:
+        print(f"Converting embedding_vector to vector({expected_dims}) in batches of {batch_size}...")
+        convert_array_to_vector(expected_dims, batch_size=batch_size)
+
+    # Build the index online, after the conversion has committed
+    print("Ensuring ANN index on embedding_vector (cosine) exists...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            create_vector_index(conn, use_hnsw=use_hnsw)
+        finally:
+            # Don't hand the session-level setting back to the pool
+            conn.execute(text("RESET maintenance_work_mem"))
 
+    with engine.connect() as conn:
         print("Verifying row counts post-operations...")
         postcheck_counts(conn, before_count)
 
-        # Simple sanity: run a tiny query using the operator to confirm availability
+        # Simple sanity: evaluate the operator on a single row (no ORDER BY, so no index scan)
         print("Sanity check: cosine operator available...")
-        _ = _fetch_all(conn, "SELECT 1 FROM embedding ORDER BY embedding_vector <=> embedding_vector LIMIT 1")
+        _ = _fetch_all(conn, "SELECT (embedding_vector <=> embedding_vector) FROM embedding LIMIT 1")
         print("Migration complete.")
 
 
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Migration: store embedding.embedding_vector as halfvec(1536) instead of vector(1536).
+
+Half-precision storage halves the size of each embedding (about 3 KB instead
+of 6 KB) and of the HNSW index built over it, so more of the index stays in
+shared buffers. text-embedding-3-small vectors are unit-normalised, well
+within fp16 range, and recall of cosine search is effectively unchanged.
+
+Requires pgvector >= 0.7 (the first release with halfvec); fails fast otherwise.
+
+- Backfills a new column in short batched transactions, then swaps it in under
+  a brief ACCESS EXCLUSIVE lock (no full-table ALTER ... TYPE rewrite)
+- Safe to re-run: resumes an interrupted backfill and skips the conversion
+  once the column is already halfvec
+- The old column's ANN index keeps serving searches until the swap; the HNSW
+  index on the new column is then built CONCURRENTLY
+- Deploy the halfvec-aware application code after the swap has committed
+- Confirmation prompt unless --confirm is passed
+- Optional --dry-run to see what would be executed
+"""
+
+import argparse
+import sys
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.db import engine, get_database_url
+from migrations._helpers import drop_invalid_index
+
+
+DIMS = 1536
+DEFAULT_BATCH_SIZE = 10_000
+INDEX_NAME = "embedding_vec_cosine_hnsw"
+
+PGVECTOR_VERSION_SQL = text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+
+COLUMN_TYPE_SQL = text(
+    """
+SELECT format_type(a.atttypid, a.atttypmod)
+FROM pg_attribute a
+JOIN pg_class c ON c.oid = a.attrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public' AND c.relname = 'embedding' AND a.attname = 'embedding_vector'
+  AND a.attnum > 0
+  AND NOT a.attisdropped
+"""
+)
+
+ADD_COLUMN_SQL = f"ALTER TABLE public.embedding ADD COLUMN IF NOT EXISTS embedding_vector_h halfvec({DIMS});"
+
+ID_RANGE_SQL = text("SELECT MIN(id), MAX(id) FROM public.embedding")
+
+BACKFILL_SQL = text(
+    f"""
+UPDATE public.embedding
+SET embedding_vector_h = embedding_vector::halfvec({DIMS})
+WHERE id BETWEEN :lo AND :hi
+  AND embedding_vector_h IS NULL
+  AND embedding_vector IS NOT NULL
+"""
+)
+
+SWAP_COMMANDS: List[str] = [
+    "LOCK TABLE public.embedding IN ACCESS EXCLUSIVE MODE;",
+    # Catch rows inserted while the backfill was running
+    f"UPDATE public.embedding SET embedding_vector_h = embedding_vector::halfvec({DIMS}) "
+    "WHERE embedding_vector_h IS NULL AND embedding_vector IS NOT NULL;",
+    # Also drops the old column's ivfflat/hnsw indexes
+    "ALTER TABLE public.embedding DROP COLUMN embedding_vector;",
+    "ALTER TABLE public.embedding RENAME COLUMN embedding_vector_h TO embedding_vector;",
+]
+
+CREATE_INDEX_SQL = (
+    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{INDEX_NAME}" ON public.embedding '
+    "USING hnsw (embedding_vector halfvec_cosine_ops) WITH (m = 16, ef_construction = 200);"
+)
+
+
+def check_pgvector_version(conn) -> str:
+    version = conn.execute(PGVECTOR_VERSION_SQL).scalar()
+    if version is None:
+        raise RuntimeError("The vector extension is not installed in this database.")
+    major, minor = (int(part) for part in version.split(".")[:2])
+    if (major, minor) < (0, 7):
+        raise RuntimeError(f"halfvec requires pgvector >= 0.7; this database has {version}.")
+    return version
+
+
+def backfill(batch_size: int) -> None:
+    with engine.begin() as conn:
+        lo_id, hi_id = conn.execute(ID_RANGE_SQL).one()
+    if lo_id is None:
+        return
+
+    for lo in range(int(lo_id), int(hi_id) + 1, batch_size):
+        hi = lo + batch_size - 1
+        with engine.begin() as conn:
+            conn.execute(BACKFILL_SQL, {"lo": lo, "hi": hi})
+        print(f"  backfilled ids {lo}..{min(hi, int(hi_id))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"Convert embedding.embedding_vector from vector({DIMS}) to halfvec({DIMS})"
+    )
+    parser.add_argument("--confirm", action="store_true", help="Skip confirmation prompt")
+    parser.add_argument("--dry-run", action="store_true", help="Print actions without executing")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Embedding ids backfilled per transaction (default: {DEFAULT_BATCH_SIZE})",
+    )
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    # Show DB target for sanity
+    try:
+        db_url = get_database_url()
+        host_port_db = db_url.split("@")[1] if "@" in db_url else db_url
+        print(f"Target database: {host_port_db}")
+    except Exception as e:
+        print(f"Failed to resolve database URL: {e}")
+        sys.exit(1)
+
+    try:
+        with engine.connect() as conn:
+            version = check_pgvector_version(conn)
+            column_type = conn.execute(COLUMN_TYPE_SQL).scalar()
+        print(f"pgvector {version}; embedding.embedding_vector is {column_type}")
+
+        if column_type is None:
+            raise RuntimeError("Column public.embedding.embedding_vector not found.")
+        needs_conversion = column_type != f"halfvec({DIMS})"
+        if needs_conversion and column_type != f"vector({DIMS})":
+            raise RuntimeError(f"Expected vector({DIMS}) or halfvec({DIMS}), found {column_type}.")
+
+        if args.dry_run:
+            if needs_conversion:
+                print(f"Would execute: {ADD_COLUMN_SQL}")
+                print(f"Would execute in batches of {args.batch_size} ids: {BACKFILL_SQL.text.strip()}")
+                for sql in SWAP_COMMANDS:
+                    print(f"Would execute: {sql}")
+            else:
+                print("No-op: column is already halfvec; skipping conversion.")
+            print(f"Would execute: {CREATE_INDEX_SQL}")
+            return
+
+        if not args.confirm:
+            resp = input(
+                f"This will convert embedding.embedding_vector to halfvec({DIMS}) and rebuild its HNSW index. "
+                "Continue? (yes/no): "
+            ).strip().lower()
+            if resp not in ("yes", "y"):
+                print("Aborted.")
+                return
+
+        if needs_conversion:
+            with engine.begin() as conn:
+                print(f"Executing: {ADD_COLUMN_SQL}")
+                conn.execute(text(ADD_COLUMN_SQL))
+
+            print(f"Backfilling embedding_vector_h in batches of {args.batch_size} ids...")
+            backfill(args.batch_size)
+
+            with engine.begin() as conn:
+                for sql in SWAP_COMMANDS:
+                    print(f"Executing: {sql}")
+                    conn.execute(text(sql))
+            print(f"✓ embedding.embedding_vector is now halfvec({DIMS}).")
+        else:
+            print("No-op: column is already halfvec; skipping conversion.")
+
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if drop_invalid_index(conn, INDEX_NAME):
+                print(f"Dropped invalid index public.{INDEX_NAME} from an earlier failed build.")
+            conn.execute(text("SET maintenance_work_mem = '256MB'"))
+            try:
+                print(f"Executing: {CREATE_INDEX_SQL}")
+                conn.execute(text(CREATE_INDEX_SQL))
+            finally:
+                # Don't hand the session-level setting back to the pool
+                conn.execute(text("RESET maintenance_work_mem"))
+        print(f"✓ public.{INDEX_NAME} exists on embedding(embedding_vector halfvec_cosine_ops).")
+
+    except (SQLAlchemyError, RuntimeError) as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,9 +19,6 @@ import argparse
 import os
 from typing import List
 
-from sqlalchemy import text
-from sqlmodel import Session
-
 from db.db import engine
 
 
@@ -104,9 +101,9 @@ def main() -> None:
             print("Aborted.")
             return
 
-    with Session(engine) as session:
-        session.exec(text(sql))
-        session.commit()
+    # Send the whole script as one simple-query message: a single round-trip
+    with engine.begin() as conn:
+        conn.exec_driver_sql(sql)
         print(
             f"Completed role setup. Role '{args.role}' has SELECT on {len(APP_TABLES)} tables in '{db_name}'."
         )
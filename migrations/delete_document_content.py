@@ -6,54 +6,61 @@ The Publication and Document records remain intact.
 
 import argparse
 import sys
-from sqlmodel import Session, select, delete, Column
+from sqlalchemy import text
 from db.db import engine
-from db.schema import ContentData, Embedding, Node
 
 
-def delete_document_content(document_id: int) -> tuple[int, int]:
+DEFAULT_BATCH_SIZE = 10_000
+
+# Deleting ContentData cascades to its embeddings (ON DELETE CASCADE, see
+# migrations/cascade_content_foreign_keys.py). The embedding count reads the
+# statement's snapshot, i.e. the rows the cascade is about to remove.
+DELETE_DOCUMENT_CONTENT_SQL = text(
+    """
+WITH d_cd AS (
+    DELETE FROM contentdata
+    WHERE id IN (
+        SELECT cd.id
+        FROM contentdata cd
+        JOIN node n ON n.id = cd.node_id
+        WHERE n.document_id = :doc
+        ORDER BY cd.id
+        LIMIT :batch_size
+    )
+    RETURNING id
+)
+SELECT
+    (SELECT count(*) FROM d_cd) AS content_data_count,
+    (SELECT count(*) FROM embedding WHERE content_data_id IN (SELECT id FROM d_cd)) AS embedding_count
+"""
+)
+
+
+def delete_document_content(
+    document_id: int, batch_size: int = DEFAULT_BATCH_SIZE
+) -> tuple[int, int]:
     """
     Delete all ContentData and Embedding records associated with a document.
+
+    Rows are deleted in batches of batch_size ContentData records, each in its
+    own transaction, to bound lock duration and WAL volume per commit.
     
     Returns:
         Tuple of (content_data_count, embedding_count) deleted
     """
-    with Session(engine) as session:
-        # First, get all ContentData records associated with this document
-        # We need to join through Node to get to the document_id
-        content_data_query = (
-            select(ContentData)
-            .join(Node)
-            .where(Node.document_id == document_id)
-        )
-        content_data_records = session.exec(content_data_query).all()
-        
-        content_data_count = len(content_data_records)
-        embedding_count = 0
-        
-        # For each ContentData record, delete associated Embeddings first
-        for content_data in content_data_records:
-            # Count embeddings before deletion
-            embeddings_query = select(Embedding).where(Embedding.content_data_id == content_data.id)
-            embeddings = session.exec(embeddings_query).all()
-            embedding_count += len(embeddings)
-            
-            # Delete embeddings
-            delete_stmt = delete(Embedding).where(Embedding.content_data_id == content_data.id)
-            session.exec(delete_stmt)
-        
-        # Now delete all ContentData records
-        # We can't use a simple join in the delete statement with SQLModel,
-        # so we delete by IDs
-        content_data_ids = [cd.id for cd in content_data_records if cd.id is not None]
-        if content_data_ids:
-            delete_stmt = delete(ContentData).where(Column(ContentData.id).in_(content_data_ids))
-            session.exec(delete_stmt)
-        
-        # Commit the transaction
-        session.commit()
-        
-        return content_data_count, embedding_count
+    content_total = embedding_total = 0
+    while True:
+        with engine.begin() as conn:
+            row = conn.execute(
+                DELETE_DOCUMENT_CONTENT_SQL,
+                {"doc": document_id, "batch_size": batch_size},
+            ).one()
+        content_total += row.content_data_count
+        embedding_total += row.embedding_count
+        if row.content_data_count < batch_size:
+            break
+
+    return content_total, embedding_total
 
 
 def main():
@@ -70,8 +77,16 @@ def main():
         action="store_true",
         help="Skip confirmation prompt"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"ContentData rows deleted per transaction (default: {DEFAULT_BATCH_SIZE})"
+    )
     
     args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
     
     # Confirmation prompt unless --confirm is passed
     if not args.confirm:
@@ -82,7 +97,9 @@ def main():
     
     try:
         print(f"Deleting content for document {args.document_id}...")
-        content_count, embedding_count = delete_document_content(args.document_id)
+        content_count, embedding_count = delete_document_content(
+            args.document_id, args.batch_size
+        )
         print(f"Successfully deleted {content_count} ContentData records and {embedding_count} Embedding records.")
     except Exception as e:
         print(f"Error during deletion: {e}", file=sys.stderr)
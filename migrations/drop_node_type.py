@@ -3,6 +3,8 @@
 Migration: remove NodeType and node.node_type, and enforce NOT NULL on node.tag_name.
 
 - Safe to re-run (checks existence; uses IF EXISTS where possible)
+- NOT NULL is enforced via a NOT VALID CHECK constraint validated in its own
+  transaction, so the table scan does not run under an ACCESS EXCLUSIVE lock
 - Confirmation prompt unless --confirm is passed
 - Optional --dry-run to see what would be executed
 """
@@ -12,20 +14,20 @@ import sys
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from db.db import engine, get_database_url
+from migrations._helpers import columns_exist
 
 
-CHECK_COLUMN_SQL = text(
+CHECK_NULLS_SQL = text(
     """
-SELECT 1
-FROM information_schema.columns
-WHERE table_schema = :schema
-  AND table_name = :table
-  AND column_name = :column
-LIMIT 1
+SELECT EXISTS (
+    SELECT 1
+    FROM public.node
+    WHERE tag_name IS NULL
+)
 """
 )
 
-CHECK_NULLS_SQL = text(
+COUNT_NULLS_SQL = text(
     """
 SELECT COUNT(*)
 FROM public.node
@@ -37,23 +39,40 @@ ALTER_DROP_COLUMN_SQL = text(
     "ALTER TABLE public.node DROP COLUMN IF EXISTS node_type;"
 )
 
+CHECK_TAGNAME_NOT_NULL_SQL = text(
+    """
+SELECT a.attnotnull
+FROM pg_attribute a
+WHERE a.attrelid = 'public.node'::regclass
+  AND a.attname = 'tag_name'
+  AND NOT a.attisdropped
+"""
+)
+
+# DROP IF EXISTS first so a run interrupted after this step can be repeated
+ADD_TAGNAME_CHECK_SQL = text(
+    "ALTER TABLE public.node DROP CONSTRAINT IF EXISTS tag_name_not_null, "
+    "ADD CONSTRAINT tag_name_not_null CHECK (tag_name IS NOT NULL) NOT VALID;"
+)
+
+VALIDATE_TAGNAME_CHECK_SQL = text(
+    "ALTER TABLE public.node VALIDATE CONSTRAINT tag_name_not_null;"
+)
+
+# With the validated CHECK in place, SET NOT NULL skips its own table scan
 ALTER_TAGNAME_NOT_NULL_SQL = text(
     "ALTER TABLE public.node ALTER COLUMN tag_name SET NOT NULL;"
 )
 
+DROP_TAGNAME_CHECK_SQL = text(
+    "ALTER TABLE public.node DROP CONSTRAINT tag_name_not_null;"
+)
+
 DROP_ENUM_SQL = text(
     "DROP TYPE IF EXISTS nodetype;"
 )
 
 
-def column_exists(conn, schema: str, table: str, column: str) -> bool:
-    return bool(
-        conn.execute(
-            CHECK_COLUMN_SQL, {"schema": schema, "table": table, "column": column}
-        ).scalar()
-    )
-
-
 def main():
     parser = argparse.ArgumentParser(
         description="Drop node.node_type column and nodetype enum; set node.tag_name NOT NULL"
@@ -82,21 +101,33 @@ def main():
     try:
         with engine.begin() as conn:
             # Check tag_name has no NULLs before enforcing NOT NULL
-            null_count = conn.execute(CHECK_NULLS_SQL).scalar() or 0
-            if null_count and null_count > 0:
+            if bool(conn.execute(CHECK_NULLS_SQL).scalar()):
+                # Only count on the failure path, for the error message
+                null_count = conn.execute(COUNT_NULLS_SQL).scalar()
                 raise RuntimeError(
                     f"Cannot set tag_name NOT NULL; found {null_count} rows with tag_name IS NULL."
                 )
 
-            node_type_exists = column_exists(conn, "public", "node", "node_type")
+            node_type_exists = bool(columns_exist(conn, [("node", "node_type")]))
+            tag_name_not_null = bool(conn.execute(CHECK_TAGNAME_NOT_NULL_SQL).scalar())
 
-            if args.dry_run:
-                if node_type_exists:
-                    print(f"Would execute: {ALTER_DROP_COLUMN_SQL.text}")
-                print(f"Would execute: {ALTER_TAGNAME_NOT_NULL_SQL.text}")
-                print(f"Would execute: {DROP_ENUM_SQL.text}")
-                return
+        not_null_steps = [
+            ADD_TAGNAME_CHECK_SQL,
+            VALIDATE_TAGNAME_CHECK_SQL,
+            ALTER_TAGNAME_NOT_NULL_SQL,
+        ]
 
+        if args.dry_run:
+            if node_type_exists:
+                print(f"Would execute: {ALTER_DROP_COLUMN_SQL.text}")
+            if not tag_name_not_null:
+                for stmt in not_null_steps:
+                    print(f"Would execute: {stmt.text}")
+                print(f"Would execute: {DROP_TAGNAME_CHECK_SQL.text}")
+            print(f"Would execute: {DROP_ENUM_SQL.text}")
+            return
+
+        with engine.begin() as conn:
             if node_type_exists:
                 print(f"Executing: {ALTER_DROP_COLUMN_SQL.text}")
                 conn.execute(ALTER_DROP_COLUMN_SQL)
@@ -104,10 +135,20 @@ def main():
             else:
                 print("No-op: column 'node_type' does not exist on 'public.node'.")
 
-            print(f"Executing: {ALTER_TAGNAME_NOT_NULL_SQL.text}")
-            conn.execute(ALTER_TAGNAME_NOT_NULL_SQL)
+        if tag_name_not_null:
+            print("No-op: 'public.node.tag_name' is already NOT NULL.")
+        else:
+            # One transaction per step: only the catalog updates take the exclusive lock
+            for stmt in not_null_steps:
+                with engine.begin() as conn:
+                    print(f"Executing: {stmt.text}")
+                    conn.execute(stmt)
+            with engine.begin() as conn:
+                print(f"Executing: {DROP_TAGNAME_CHECK_SQL.text}")
+                conn.execute(DROP_TAGNAME_CHECK_SQL)
             print("✓ Enforced NOT NULL on 'public.node.tag_name'.")
 
+        with engine.begin() as conn:
             print(f"Executing: {DROP_ENUM_SQL.text}")
             conn.execute(DROP_ENUM_SQL)
             print("✓ Dropped type 'nodetype' if it existed.")
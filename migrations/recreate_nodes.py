@@ -10,60 +10,56 @@ This script will:
 5. Recreate dependent tables (Relation, Embedding)
 
 Publication and Document tables will be preserved with their data intact.
+
+When the schema is unchanged and the goal is only to empty those tables, pass
+--truncate to run a single TRUNCATE instead of the drop/recreate steps.
 """
 
+import argparse
 import sys
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from db.db import engine, get_database_url
 from db.schema import SQLModel
 
 def execute_sql_commands(commands):
-    """Execute a list of SQL commands with proper transaction handling."""
+    """Execute a list of SQL commands as one batch in a single transaction."""
+    for command in commands:
+        print(f"Executing: {command}")
     with engine.begin() as conn:  # Use begin() for automatic transaction management
-        for command in commands:
-            print(f"Executing: {command}")
-            try:
-                conn.execute(text(command))
-                print("✓ Success")
-            except SQLAlchemyError as e:
-                print(f"✗ Error: {e}")
-                raise
+        try:
+            # One multi-statement script: a single round trip instead of one per command
+            conn.exec_driver_sql("\n".join(commands))
+            print("✓ Success")
+        except SQLAlchemyError as e:
+            print(f"✗ Error: {e}")
+            raise
 
-def drop_dependent_tables():
-    """Drop tables that depend on Node/ContentData tables."""
-    print("\n1️⃣  Dropping dependent tables...")
-    commands = [
-        "DROP TABLE IF EXISTS embedding CASCADE;",
-        "DROP TABLE IF EXISTS relation CASCADE;",
-    ]
-    execute_sql_commands(commands)
+# Dependents first, then Node/ContentData, then the enums those tables used.
+# Sent as one script in one transaction (see execute_sql_commands).
+TEARDOWN_COMMANDS = [
+    # Tables that depend on Node/ContentData
+    "DROP TABLE IF EXISTS embedding CASCADE;",
+    "DROP TABLE IF EXISTS relation CASCADE;",
+    # Node and ContentData
+    "DROP TABLE IF EXISTS contentdata CASCADE;",
+    "DROP TABLE IF EXISTS node CASCADE;",
+    # Enums used by the tables being recreated.
+    # DocumentType is NOT dropped - it's used by Document table which is preserved
+    "DROP TYPE IF EXISTS nodetype CASCADE;",
+    "DROP TYPE IF EXISTS tagname CASCADE;",
+    "DROP TYPE IF EXISTS sectiontype CASCADE;",
+    "DROP TYPE IF EXISTS embeddingsource CASCADE;",
+    "DROP TYPE IF EXISTS relationtype CASCADE;",
+]
 
-def drop_main_tables():
-    """Drop Node and ContentData tables."""
-    print("\n2️⃣  Dropping Node and ContentData tables...")
-    commands = [
-        "DROP TABLE IF EXISTS contentdata CASCADE;",
-        "DROP TABLE IF EXISTS node CASCADE;",
-    ]
-    execute_sql_commands(commands)
-
-def drop_enums():
-    """Drop only enum types used by tables being recreated."""
-    print("\n3️⃣  Dropping enums used by Node/ContentData/Relation/Embedding tables...")
-    commands = [
-        # DocumentType is NOT dropped - it's used by Document table which is preserved
-        "DROP TYPE IF EXISTS nodetype CASCADE;",
-        "DROP TYPE IF EXISTS tagname CASCADE;",
-        "DROP TYPE IF EXISTS sectiontype CASCADE;",
-        "DROP TYPE IF EXISTS embeddingsource CASCADE;",
-        "DROP TYPE IF EXISTS relationtype CASCADE;",
-    ]
-    execute_sql_commands(commands)
+def drop_tables_and_enums():
+    """Drop Node-related tables and the enums they use."""
+    print("\n1️⃣  Dropping Embedding, Relation, ContentData and Node tables and their enums...")
+    execute_sql_commands(TEARDOWN_COMMANDS)
 
 def recreate_tables():
     """Recreate all tables using SQLModel metadata."""
-    print("\n4️⃣  Recreating tables with updated schema...")
+    print("\n2️⃣  Recreating tables with updated schema...")
     try:
         # This will create all tables, but Publication and Document already exist
         # SQLModel will only create the missing ones
@@ -73,6 +69,15 @@ def recreate_tables():
         print(f"✗ Error recreating tables: {e}")
         raise
 
+def truncate_tables():
+    """Empty Node, ContentData, Relation and Embedding tables, keeping the schema."""
+    print("\n🧹 Truncating Node, ContentData, Relation and Embedding tables...")
+    commands = [
+        # No CASCADE: fail rather than silently empty any other table referencing these
+        "TRUNCATE TABLE embedding, relation, contentdata, node RESTART IDENTITY;",
+    ]
+    execute_sql_commands(commands)
+
 def print_summary():
     """Print migration summary."""
     print("\n✅ Schema update completed successfully!")
@@ -88,10 +93,24 @@ def print_summary():
 
 def main():
     """Main function to drop and recreate schema components."""
-    
-    print("🗄️  Starting database schema update...")
-    print("📋 This will drop and recreate: Node-related enums, Node, ContentData, Relation, Embedding tables")
-    print("💾 Publication and Document tables (and DocumentType enum) will be preserved")
+    parser = argparse.ArgumentParser(
+        description="Drop and recreate Node-related tables and enums, preserving Publication and Document"
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Only empty Node, ContentData, Relation and Embedding (schema unchanged)",
+    )
+    args = parser.parse_args()
+
+    if args.truncate:
+        print("🗄️  Starting table truncation...")
+        print("📋 This will delete all rows from: Node, ContentData, Relation, Embedding tables")
+        print("💾 Schema, Publication and Document tables will be preserved")
+    else:
+        print("🗄️  Starting database schema update...")
+        print("📋 This will drop and recreate: Node-related enums, Node, ContentData, Relation, Embedding tables")
+        print("💾 Publication and Document tables (and DocumentType enum) will be preserved")
     
     # Validate database connection
     try:
@@ -107,13 +126,20 @@ def main():
         print("Aborted.")
         return
     
+    if args.truncate:
+        try:
+            truncate_tables()
+            print("\n✅ Node, ContentData, Relation and Embedding tables emptied; identities reset.")
+        except Exception as e:
+            print(f"\n❌ Truncation failed: {e}")
+            sys.exit(1)
+        return
+
     print("\n🔄 Starting schema update process...")
     
     try:
         # Execute migration steps
-        drop_dependent_tables()
-        drop_main_tables() 
-        drop_enums()
+        drop_tables_and_enums()
         recreate_tables()
         
         print_summary()
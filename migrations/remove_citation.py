@@ -12,27 +12,12 @@ import sys
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from db.db import engine, get_database_url
+from migrations._helpers import columns_exist
 
 
-CHECK_SQL = text("""
-SELECT 1
-FROM information_schema.columns
-WHERE table_schema = :schema
-  AND table_name = :table
-  AND column_name = :column
-LIMIT 1
-""")
-
 DROP_SQL = text("ALTER TABLE public.publication DROP COLUMN IF EXISTS citation;")
 
 
-def column_exists(conn, schema: str, table: str, column: str) -> bool:
-    return bool(conn.execute(
-        CHECK_SQL,
-        {"schema": schema, "table": table, "column": column}
-    ).scalar())
-
-
 def main():
     parser = argparse.ArgumentParser(description="Drop 'citation' column from 'publication' table")
     parser.add_argument("--confirm", action="store_true", help="Skip confirmation prompt")
@@ -56,7 +41,7 @@ def main():
 
     try:
         with engine.begin() as conn:
-            if not column_exists(conn, "public", "publication", "citation"):
+            if not columns_exist(conn, [("publication", "citation")]):
                 print("No-op: column 'citation' does not exist on 'public.publication'.")
                 return
 
@@ -2,34 +2,48 @@
 """
 Migration: Rename column 'metadata' to 'publication_metadata' on table 'publication'.
 
-- Idempotent: inspects information_schema before acting
+- Idempotent: inspects the catalog before acting
 - Safe: only renames when old exists and new does not
+- Atomic: check and rename run server-side in one DO block, so nothing can
+  change the columns between the probe and the ALTER
 - Supports --dry-run and --confirm flags
 """
 
 from __future__ import annotations
 
 import argparse
-from typing import Set
-
-from sqlalchemy import text
-from sqlmodel import Session
 
 from db.db import engine, get_database_url
 
 
-def get_existing_columns(session: Session) -> Set[str]:
-    rows = session.exec(
-        text(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'publication'
-              AND column_name IN ('metadata', 'publication_metadata')
-            """
-        )
-    )
-    return {row[0] for row in rows}
+# Outcomes are reported with RAISE NOTICE and printed by the notice handler
+RENAME_SQL = """
+DO $$
+DECLARE
+    has_old boolean := EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = 'public.publication'::regclass
+          AND attname = 'metadata' AND NOT attisdropped
+    );
+    has_new boolean := EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = 'public.publication'::regclass
+          AND attname = 'publication_metadata' AND NOT attisdropped
+    );
+BEGIN
+    IF has_new AND NOT has_old THEN
+        RAISE NOTICE 'No action: column already renamed to ''publication_metadata''.';
+    ELSIF has_new AND has_old THEN
+        RAISE NOTICE 'Both ''metadata'' and ''publication_metadata'' exist. No automatic action taken.';
+    ELSIF NOT has_old THEN
+        RAISE NOTICE 'Neither column exists on ''publication''. Nothing to do.';
+    ELSE
+        ALTER TABLE public.publication RENAME COLUMN metadata TO publication_metadata;
+        RAISE NOTICE 'Completed: renamed ''metadata'' to ''publication_metadata'' on ''publication''.';
+    END IF;
+END
+$$;
+"""
 
 
 def main() -> None:
@@ -57,41 +71,28 @@ def main() -> None:
     except Exception as e:
         print(f"Failed to resolve database URL: {e}")
 
-    with Session(engine) as session:
-        cols = get_existing_columns(session)
-        has_old = "metadata" in cols
-        has_new = "publication_metadata" in cols
+    if args.dry_run:
+        print(RENAME_SQL)
+        return
 
-        if has_new and not has_old:
-            print("No action: column already renamed to 'publication_metadata'.")
-            return
-        if has_new and has_old:
-            print(
-                "Both 'metadata' and 'publication_metadata' exist. No automatic action taken."
-            )
+    if not args.confirm:
+        resp = input(
+            "This will RENAME column 'metadata' to 'publication_metadata' on table 'publication' if needed. Continue? (yes/no): "
+        ).strip().lower()
+        if resp not in ("yes", "y"):
+            print("Aborted.")
             return
-        if not has_old and not has_new:
-            print("Neither column exists on 'publication'. Nothing to do.")
-            return
-
-        # At this point: old exists, new does not -> rename
-        sql = "ALTER TABLE public.publication RENAME COLUMN metadata TO publication_metadata;"
 
-        if args.dry_run:
-            print(sql)
-            return
+    def print_notice(diag) -> None:
+        print(diag.message_primary)
 
-        if not args.confirm:
-            resp = input(
-                "This will RENAME column 'metadata' to 'publication_metadata' on table 'publication'. Continue? (yes/no): "
-            ).strip().lower()
-            if resp not in ("yes", "y"):
-                print("Aborted.")
-                return
-
-        session.exec(text(sql))
-        session.commit()
-        print("Completed: renamed 'metadata' to 'publication_metadata' on 'publication'.")
+    with engine.begin() as conn:
+        pg_conn = conn.connection.driver_connection
+        pg_conn.add_notice_handler(print_notice)
+        try:
+            conn.exec_driver_sql(RENAME_SQL)
+        finally:
+            pg_conn.remove_notice_handler(print_notice)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,13 @@
 import os
+import queue
 import sys
+import threading
 from contextlib import contextmanager
-from typing import Any, Dict, Iterable, List, Sequence, Generator
+from typing import Any, Dict, Iterable, List, Sequence
 
 from dotenv import dotenv_values
-from sqlalchemy import MetaData, Table, create_engine, select, text
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Connection, Engine
-from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 
 def _build_db_url(config: Dict[str, str]) -> str:
@@ -16,7 +17,7 @@ def _build_db_url(config: Dict[str, str]) -> str:
     host = config.get("POSTGRES_HOST", "localhost")
     port = config.get("POSTGRES_PORT", "5432")
     db = config.get("POSTGRES_DB", "ccdr-explorer-db")
-    return f"postgresql://{user}:{password}@{host}:{port}/{db}"
+    return f"postgresql+psycopg://{user}:{password}@{host}:{port}/{db}"
 
 
 def _load_envs(local_env_path: str = ".env", prod_env_path: str = ".env.production") -> Dict[str, Dict[str, str]]:
@@ -29,29 +30,15 @@ def _load_envs(local_env_path: str = ".env", prod_env_path: str = ".env.producti
     return {"local": dict(local_cfg), "prod": dict(prod_cfg)}
 
 
-def _reflect_tables(engine: Engine, table_names: Sequence[str]) -> Dict[str, Table]:
-    meta = MetaData()
-    meta.reflect(bind=engine, only=table_names)
-    return {tname: meta.tables[tname] for tname in table_names}
-
-
-def _stream_rows(local_conn: Connection, sql: str, params: Dict[str, Any] | None, chunk_size: int) -> Generator[List[Dict[str, Any]], None, None]:
-    """Stream rows from a query in chunks to keep memory bounded."""
-    res = local_conn.execution_options(stream_results=True).execute(text(sql), params or {})
-    while True:
-        rows = res.fetchmany(chunk_size)
-        if not rows:
-            break
-        yield [dict(r._mapping) for r in rows]
-
-
-def _describe_table(conn: Connection, table_name: str) -> List[Dict[str, Any]]:
-    """Return a normalized description of a table's columns for schema comparison.
+def _describe_tables(conn: Connection, table_names: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Return a normalized description of each table's columns for schema comparison.
     Captures column name, data type, is_nullable, default expression, and identity.
+    All tables are described in one catalog query, keyed by table name.
     """
     sql = text(
         """
         SELECT
+            c.relname AS table_name,
             a.attname AS column_name,
             pg_catalog.format_type(a.atttypid, a.atttypmod) AS data_type,
             NOT a.attnotnull AS is_nullable,
@@ -63,73 +50,104 @@ def _describe_table(conn: Connection, table_name: str) -> List[Dict[str, Any]]:
         LEFT JOIN pg_attrdef ad ON a.attrelid = ad.adrelid AND a.attnum = ad.adnum
         WHERE c.relkind = 'r'
           AND n.nspname = 'public'
-          AND c.relname = :tname
+          AND c.relname = ANY(:tnames)
           AND a.attnum > 0 AND NOT a.attisdropped
-        ORDER BY a.attnum
+        -- By name, not attnum: inserts are by column name, and a column swapped in
+        -- by a migration (e.g. the chunked vector conversion) moves to the end
+        ORDER BY c.relname, a.attname
         """
     )
-    res = conn.execute(sql, {"tname": table_name})
-    rows = [dict(r._mapping) for r in res.fetchall()]
-    # Normalize defaults that embed sequence names to a placeholder
-    for r in rows:
-        d = r.get("column_default") or ""
+    res = conn.execute(sql, {"tnames": list(table_names)})
+    described: Dict[str, List[Dict[str, Any]]] = {t: [] for t in table_names}
+    for r in res.mappings():
+        row = dict(r)
+        table_name = row.pop("table_name")
+        # Normalize defaults that embed sequence names to a placeholder
+        d = row.get("column_default") or ""
         if isinstance(d, str) and "nextval(" in d:
-            r["column_default"] = "nextval(...)"
-    return rows
+            row["column_default"] = "nextval(...)"
+        described[table_name].append(row)
+    return described
 
 
 def _assert_schemas_match(local_conn: Connection, prod_conn: Connection, table_names: Sequence[str]) -> None:
-    mismatches: List[str] = []
-    for t in table_names:
-        ldesc = _describe_table(local_conn, t)
-        pdesc = _describe_table(prod_conn, t)
-        if ldesc != pdesc:
-            mismatches.append(t)
+    ldesc = _describe_tables(local_conn, table_names)
+    pdesc = _describe_tables(prod_conn, table_names)
+    mismatches = [t for t in table_names if ldesc[t] != pdesc[t]]
     if mismatches:
         raise RuntimeError(f"Schema mismatch for tables: {', '.join(mismatches)}")
 
 
+_PUB_DOC_FINGERPRINT_SQL = """
+SELECT 'publication' AS t, COUNT(*) AS count,
+       COALESCE(md5(string_agg(id::text, ',' ORDER BY id)), '') AS digest
+FROM publication
+UNION ALL
+SELECT 'document', COUNT(*), COALESCE(md5(string_agg(id::text, ',' ORDER BY id)), '')
+FROM document
+"""
+
+
 def _fetch_pub_doc_fingerprints(conn: Connection) -> Dict[str, Any]:
-    """Return simple counts and checksum-ish fingerprints for publication and document.
-    Fingerprint is based on sorted array of IDs and basic stable fields to avoid huge payloads.
+    """Return row counts and an md5 digest of the sorted ids for publication and document.
+    Digests are computed server-side so only 32 characters per table cross the wire.
+    Both tables are fingerprinted in a single round trip.
     """
     fp: Dict[str, Any] = {}
-    # publication
-    pub_count = conn.execute(text("SELECT COUNT(*) FROM publication")).scalar_one()
-    pub_ids = conn.execute(text("SELECT array_agg(id ORDER BY id) FROM publication")).scalar_one()
-    # a minimal stable fingerprint on documents and publications
-    pub_minmax = conn.execute(text("SELECT COALESCE(MIN(id),0), COALESCE(MAX(id),0) FROM publication")).first()
-    fp["publication"] = {"count": pub_count, "ids": pub_ids or [], "minmax": tuple(pub_minmax) if pub_minmax else (0, 0)}
-
-    # document
-    doc_count = conn.execute(text("SELECT COUNT(*) FROM document")).scalar_one()
-    doc_ids = conn.execute(text("SELECT array_agg(id ORDER BY id) FROM document")).scalar_one()
-    doc_minmax = conn.execute(text("SELECT COALESCE(MIN(id),0), COALESCE(MAX(id),0) FROM document")).first()
-    fp["document"] = {"count": doc_count, "ids": doc_ids or [], "minmax": tuple(doc_minmax) if doc_minmax else (0, 0)}
+    for r in conn.execute(text(_PUB_DOC_FINGERPRINT_SQL)).mappings():
+        fp[r["t"]] = {"count": r["count"], "digest": r["digest"]}
     return fp
 
 
+def _fetch_ids(conn: Connection, table_name: str) -> List[int]:
+    return conn.execute(text(f"SELECT array_agg(id ORDER BY id) FROM {table_name}")).scalar_one() or []
+
+
 def _assert_pub_doc_match(local_conn: Connection, prod_conn: Connection) -> None:
     lfp = _fetch_pub_doc_fingerprints(local_conn)
     pfp = _fetch_pub_doc_fingerprints(prod_conn)
     for t in ("publication", "document"):
         if lfp[t]["count"] != pfp[t]["count"]:
             raise RuntimeError(f"{t} row count differs (local={lfp[t]['count']}, prod={pfp[t]['count']})")
-        if lfp[t]["ids"] != pfp[t]["ids"]:
-            raise RuntimeError(f"{t} id sets differ between local and prod")
-        if lfp[t]["minmax"] != pfp[t]["minmax"]:
-            raise RuntimeError(f"{t} id min/max differ between local and prod")
+        if lfp[t]["digest"] != pfp[t]["digest"]:
+            # Only pull the id lists when they are known to differ, to report how
+            local_ids = set(_fetch_ids(local_conn, t))
+            prod_ids = set(_fetch_ids(prod_conn, t))
+            raise RuntimeError(
+                f"{t} id sets differ between local and prod. "
+                f"Only local: {sorted(local_ids - prod_ids)[:10]}, only prod: {sorted(prod_ids - local_ids)[:10]}"
+            )
 
 
 def _assert_target_empty(prod_conn: Connection, table_names: Sequence[str]) -> None:
-    non_empty: List[str] = []
-    for t in table_names:
-        cnt = prod_conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar_one()
-        if cnt != 0:
-            non_empty.append(f"{t}({cnt})")
+    # Existence, not COUNT(*): stops at the first visible row instead of scanning
+    probes = ", ".join(f"EXISTS (SELECT 1 FROM {t}) AS {t}" for t in table_names)
+    row = prod_conn.execute(text(f"SELECT {probes}")).mappings().one()
+    non_empty = [t for t in table_names if row[t]]
     if non_empty:
         raise RuntimeError(f"Target database is not empty for: {', '.join(non_empty)}")
 
+
+_ROW_ESTIMATES_SQL = """
+SELECT c.relname, CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint END AS estimate
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public' AND c.relkind = 'r' AND c.relname = ANY(:tnames)
+"""
+
+
+def _estimate_rows(conn: Connection, table_names: Sequence[str]) -> Dict[str, str]:
+    """Planner row estimates from pg_class, formatted for logging ("unknown" if never analyzed)."""
+    res = conn.execute(text(_ROW_ESTIMATES_SQL), {"tnames": list(table_names)})
+    return {r.relname: "unknown" if r.estimate is None else f"~{r.estimate}" for r in res}
+
+
+def _count_rows(conn: Connection, table_names: Sequence[str]) -> Dict[str, int]:
+    """Exact row counts for several tables in a single round trip."""
+    counts = ", ".join(f"(SELECT COUNT(*) FROM {t}) AS {t}" for t in table_names)
+    return dict(conn.execute(text(f"SELECT {counts}")).mappings().one())
+
+
 @contextmanager
 def _connect(engine: Engine):
     with engine.connect() as conn:
@@ -141,27 +159,12 @@ def _chunked(items: List[Dict[str, Any]], size: int) -> Iterable[List[Dict[str,
         yield items[i : i + size]
 
 
-_NODE_RECURSIVE_SQL = """
-WITH RECURSIVE node_tree AS (
-    SELECT n.id, n.parent_id, 1 AS depth
-    FROM node n
-    WHERE n.parent_id IS NULL
-    UNION ALL
-    SELECT n.id, n.parent_id, nt.depth + 1
-    FROM node n
-    JOIN node_tree nt ON n.parent_id = nt.id
-)
-SELECT n.id,
-       n.document_id,
-       n.tag_name,
-       n.section_type,
-       n.parent_id,
-       n.sequence_in_parent,
-       n.positional_data,
-       nt.depth
-FROM node n
-JOIN node_tree nt ON n.id = nt.id
-ORDER BY nt.depth ASC, n.sequence_in_parent ASC, n.id ASC
+# No parent-first ordering needed: the node.parent_id foreign key is checked at
+# the end of the COPY / INSERT ... SELECT statement, after every row is in
+_NODE_SQL = """
+SELECT id, document_id, tag_name, section_type, parent_id, sequence_in_parent, positional_data
+FROM node
+ORDER BY id ASC
 """
 
 
@@ -179,6 +182,120 @@ ORDER BY id ASC
 """
 
 
+# Column lists in the same order as the SELECTs above, for binary COPY
+_NODE_COLUMNS = ("id", "document_id", "tag_name", "section_type", "parent_id", "sequence_in_parent", "positional_data")
+_CONTENTDATA_COLUMNS = ("id", "node_id", "text_content", "storage_url", "description", "caption", "embedding_source")
+_EMBEDDING_COLUMNS = ("id", "content_data_id", "embedding_vector", "model_name", "created_at")
+
+
+# Chunks buffered between the local reader thread and the production writer
+_COPY_QUEUE_CHUNKS = 256
+
+
+def _copy_rows(local_conn: Connection, prod_conn: Connection, sql: str, table: str, columns: Sequence[str]) -> None:
+    """Pipe a local query into a production table with binary COPY.
+
+    Binary tuples are only portable between identical column types, which
+    _assert_schemas_match guarantees before any data is moved. A reader thread
+    drains the local COPY into a bounded queue so reading from local and writing
+    to production overlap instead of alternating.
+    """
+    cols = ", ".join(columns)
+    chunks: "queue.Queue[bytes | None]" = queue.Queue(maxsize=_COPY_QUEUE_CHUNKS)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def read_local() -> None:
+        try:
+            with local_conn.connection.cursor() as lcur, lcur.copy(
+                f"COPY ({sql}) TO STDOUT (FORMAT BINARY)"
+            ) as lcopy:
+                for chunk in lcopy:
+                    if stop.is_set():
+                        raise RuntimeError(f"Copy into {table} aborted")
+                    chunks.put(bytes(chunk))
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            chunks.put(None)
+
+    reader = threading.Thread(target=read_local, name=f"copy-{table}", daemon=True)
+    reader.start()
+    reader_done = False
+    try:
+        with prod_conn.connection.cursor() as pcur, pcur.copy(
+            f"COPY {table} ({cols}) FROM STDIN (FORMAT BINARY)"
+        ) as pcopy:
+            while (chunk := chunks.get()) is not None:
+                pcopy.write(chunk)
+            # Server-side COPY errors (constraint or type violations) surface
+            # when the block exits, after the sentinel has been consumed
+            reader_done = True
+    except BaseException:
+        # Unblock the reader so it can finish before the error propagates;
+        # once its sentinel has been taken there is nothing left to drain
+        stop.set()
+        if not reader_done:
+            while chunks.get() is not None:
+                pass
+        raise
+    finally:
+        reader.join()
+    if errors:
+        raise errors[0]
+
+
+def _upsert_rows(local_conn: Connection, prod_conn: Connection, sql: str, table: str, columns: Sequence[str]) -> None:
+    """Upsert a local query into a production table through a staging table.
+
+    Rows are binary-COPYed into a temp copy of the table, then merged with a
+    single INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE. Foreign keys are
+    checked at the end of that statement, so row order within it is irrelevant.
+    The staging table is dropped when the transaction commits.
+    """
+    staging = f"tmp_{table}"
+    cols = ", ".join(columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != "id")
+    prod_conn.execute(text(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"))
+    _copy_rows(local_conn, prod_conn, sql, staging, columns)
+    prod_conn.execute(
+        text(
+            f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging} "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
+    )
+
+
+# Vector (ivfflat/hnsw) indexes on the embedding table, with their definitions
+_ANN_INDEXES_SQL = """
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE schemaname = 'public'
+  AND tablename = 'embedding'
+  AND (indexdef ILIKE '%USING ivfflat%' OR indexdef ILIKE '%USING hnsw%')
+"""
+
+
+def _drop_ann_indexes(prod_conn: Connection) -> List[str]:
+    """Drop the embedding table's ANN indexes and return their definitions.
+
+    Building an HNSW/ivfflat index once over the loaded table is far cheaper
+    than maintaining it row by row during the COPY.
+    """
+    indexes = [(r.indexname, r.indexdef) for r in prod_conn.execute(text(_ANN_INDEXES_SQL))]
+    for name, _ in indexes:
+        prod_conn.execute(text(f'DROP INDEX public."{name}"'))
+    return [indexdef for _, indexdef in indexes]
+
+
+def _create_ann_indexes(prod_conn: Connection, index_defs: Sequence[str]) -> None:
+    # Inside the sync transaction, so CONCURRENTLY is not available; the rows are
+    # not visible to anyone else until commit, so there is nothing to keep online
+    prod_conn.execute(text("SET LOCAL maintenance_work_mem = '256MB'"))
+    for index_def in index_defs:
+        prod_conn.execute(text(index_def))
+
+
 def _ensure_documents_exist(prod_conn: Connection, document_ids: List[int]) -> None:
     if not document_ids:
         return
@@ -195,17 +312,19 @@ def _ensure_documents_exist(prod_conn: Connection, document_ids: List[int]) -> N
 
 
 def _reset_sequences(prod_conn: Connection, table_names: Sequence[str]) -> None:
-    for tname in table_names:
-        sql = f"SELECT setval(pg_get_serial_sequence('{tname}', 'id'), COALESCE((SELECT MAX(id) FROM {tname}), 0), true)"
-        prod_conn.execute(text(sql))
+    # One SELECT with a setval per table: a single round trip
+    setvals = ", ".join(
+        f"setval(pg_get_serial_sequence('{tname}', 'id'), COALESCE((SELECT MAX(id) FROM {tname}), 0), true)"
+        for tname in table_names
+    )
+    prod_conn.execute(text(f"SELECT {setvals}"))
 
 
 def sync_local_to_prod(
     local_env_path: str = ".env",
     prod_env_path: str = ".env.production",
-    batch_size: int = 2000,
-    embedding_page_size: int = 50,
     strict_empty: bool = True,
+    rebuild_ann_index: bool = True,
 ) -> None:
     envs = _load_envs(local_env_path, prod_env_path)
     local_engine = create_engine(_build_db_url(envs["local"]))
@@ -227,18 +346,13 @@ def sync_local_to_prod(
             print("Target emptiness checks passed.")
         else:
             print("Strict emptiness checks disabled (resume mode). Skipping target-emptiness assertion.")
-        # Reflect destination (prod) tables for type-aware insertions
-        tables = _reflect_tables(pconn.engine, ("node", "contentdata", "embedding", "document"))
-        node_table: Table = tables["node"]
-        contentdata_table: Table = tables["contentdata"]
-        embedding_table: Table = tables["embedding"]
-        # Reflect document to assert existence but we don't use the Table object further
-
-        # 1) Read counts from local and verify document references via a distinct query
-        local_node_count = lconn.execute(text("SELECT COUNT(*) FROM node")).scalar_one()
-        local_content_count = lconn.execute(text("SELECT COUNT(*) FROM contentdata")).scalar_one()
-        local_embedding_count = lconn.execute(text("SELECT COUNT(*) FROM embedding")).scalar_one()
-        print(f"Local counts — nodes: {local_node_count}, contentdata: {local_content_count}, embeddings: {local_embedding_count}")
+
+        # 1) Log estimated local sizes and verify document references via a distinct query
+        est = _estimate_rows(lconn, ("node", "contentdata", "embedding"))
+        print(
+            f"Local estimated rows — nodes: {est['node']}, contentdata: {est['contentdata']}, "
+            f"embeddings: {est['embedding']}"
+        )
 
         # Verify docs referenced by nodes exist in prod without loading all nodes
         doc_ids_res = lconn.execute(text("SELECT DISTINCT document_id FROM node WHERE document_id IS NOT NULL"))
@@ -248,77 +362,44 @@ def sync_local_to_prod(
         print("Document id parity check passed.")
 
         # 2) Prepare and apply changes on production
-        # 2a) Upsert nodes in parent-first order
-        print("Upserting nodes to production (parent-first order, streaming)...")
-        node_insert = pg_insert(node_table)
-        node_update_cols = {c.name: node_insert.excluded[c.name] for c in node_table.columns if c.name != "id"}
-        for rows in _stream_rows(lconn, _NODE_RECURSIVE_SQL, None, batch_size):
-            chunk = [
-                {
-                    "id": r["id"],
-                    "document_id": r["document_id"],
-                    "tag_name": r["tag_name"],
-                    "section_type": r["section_type"],
-                    "parent_id": r["parent_id"],
-                    "sequence_in_parent": r["sequence_in_parent"],
-                    "positional_data": r["positional_data"],
-                }
-                for r in rows
-            ]
-            if chunk:
-                pconn.execute(
-                    node_insert.on_conflict_do_update(
-                        index_elements=[node_table.c.id], set_=node_update_cols
-                    ),
-                    chunk,
-                )
-
-        # 2b) Insert contentdata and embeddings from local copies (streamed)
-        print("Inserting contentdata (streaming)...")
-        if strict_empty:
-            for rows in _stream_rows(lconn, _CONTENTDATA_SQL, None, batch_size):
-                if rows:
-                    pconn.execute(contentdata_table.insert(), rows)
-        else:
-            cd_insert = pg_insert(contentdata_table)
-            cd_update_cols = {c.name: cd_insert.excluded[c.name] for c in contentdata_table.columns if c.name != "id"}
-            for rows in _stream_rows(lconn, _CONTENTDATA_SQL, None, batch_size):
-                if rows:
-                    pconn.execute(
-                        cd_insert.on_conflict_do_update(index_elements=[contentdata_table.c.id], set_=cd_update_cols),
-                        rows,
-                    )
-
-        print(f"Inserting embeddings (streaming, page_size={embedding_page_size})...")
-        # Use a reduced insertmanyvalues page size for very large rows (arrays)
-        pconn_small = pconn.execution_options(insertmanyvalues_page_size=embedding_page_size)
         if strict_empty:
-            for rows in _stream_rows(lconn, _EMBEDDING_SQL, None, embedding_page_size):
-                if rows:
-                    pconn_small.execute(embedding_table.insert(), rows)
+            # Empty target: no conflicts to resolve, so COPY straight through
+            print("Copying nodes to production (binary COPY)...")
+            _copy_rows(lconn, pconn, _NODE_SQL, "node", _NODE_COLUMNS)
+            print("Copying contentdata (binary COPY)...")
+            _copy_rows(lconn, pconn, _CONTENTDATA_SQL, "contentdata", _CONTENTDATA_COLUMNS)
+            ann_index_defs: List[str] = []
+            if rebuild_ann_index:
+                ann_index_defs = _drop_ann_indexes(pconn)
+                if ann_index_defs:
+                    print(f"Dropped {len(ann_index_defs)} ANN index(es) on embedding for the load.")
+            print("Copying embeddings (binary COPY)...")
+            _copy_rows(lconn, pconn, _EMBEDDING_SQL, "embedding", _EMBEDDING_COLUMNS)
+            if ann_index_defs:
+                print("Rebuilding ANN index(es) on embedding...")
+                _create_ann_indexes(pconn, ann_index_defs)
         else:
-            emb_insert = pg_insert(embedding_table)
-            emb_update_cols = {c.name: emb_insert.excluded[c.name] for c in embedding_table.columns if c.name != "id"}
-            for rows in _stream_rows(lconn, _EMBEDDING_SQL, None, embedding_page_size):
-                if rows:
-                    pconn_small.execute(
-                        emb_insert.on_conflict_do_update(index_elements=[embedding_table.c.id], set_=emb_update_cols),
-                        rows,
-                    )
+            # Existing rows: COPY into staging tables, then upsert from them
+            print("Upserting nodes to production (binary COPY via staging table)...")
+            _upsert_rows(lconn, pconn, _NODE_SQL, "node", _NODE_COLUMNS)
+            print("Upserting contentdata (binary COPY via staging table)...")
+            _upsert_rows(lconn, pconn, _CONTENTDATA_SQL, "contentdata", _CONTENTDATA_COLUMNS)
+            print("Upserting embeddings (binary COPY via staging table)...")
+            _upsert_rows(lconn, pconn, _EMBEDDING_SQL, "embedding", _EMBEDDING_COLUMNS)
 
         # 2c) Reset sequences
         print("Resetting sequences for node, contentdata, embedding...")
         _reset_sequences(pconn, ("node", "contentdata", "embedding"))
 
         # 2d) Post-insert sanity checks (counts)
-        node_count_prod = pconn.execute(select(text("COUNT(*)")).select_from(node_table)).scalar_one()
-        content_count_prod = pconn.execute(select(text("COUNT(*)")).select_from(contentdata_table)).scalar_one()
-        embedding_count_prod = pconn.execute(select(text("COUNT(*)")).select_from(embedding_table)).scalar_one()
-        if node_count_prod < local_node_count:
+        local_counts = _count_rows(lconn, ("node", "contentdata", "embedding"))
+        prod_counts = _count_rows(pconn, ("node", "contentdata", "embedding"))
+        print(f"Row counts — local: {local_counts}, prod: {prod_counts}")
+        if prod_counts["node"] < local_counts["node"]:
             raise RuntimeError("Fewer nodes in production than local after sync; aborting.")
-        if content_count_prod != local_content_count:
+        if prod_counts["contentdata"] != local_counts["contentdata"]:
             raise RuntimeError("ContentData row count mismatch after sync; aborting.")
-        if embedding_count_prod != local_embedding_count:
+        if prod_counts["embedding"] != local_counts["embedding"]:
             raise RuntimeError("Embedding row count mismatch after sync; aborting.")
 
         print("Sync complete.")
@@ -327,10 +408,10 @@ def sync_local_to_prod(
 if __name__ == "__main__":
     local_env = os.environ.get("LOCAL_ENV_FILE", ".env")
     prod_env = os.environ.get("PROD_ENV_FILE", ".env.production")
-    embed_ps = int(os.environ.get("EMBED_PAGE_SIZE", "50"))
     strict = os.environ.get("STRICT_EMPTY", "1") not in ("0", "false", "False")
+    rebuild_ann = os.environ.get("REBUILD_ANN_INDEX", "1") not in ("0", "false", "False")
     try:
-        sync_local_to_prod(local_env, prod_env, embedding_page_size=embed_ps, strict_empty=strict)
+        sync_local_to_prod(local_env, prod_env, strict_empty=strict, rebuild_ann_index=rebuild_ann)
     except Exception as exc:
         print(f"Error: {exc}")
         sys.exit(1)
@@ -1,10 +1,29 @@
 # services/semantic_search.py
-from typing import List, Optional, TypedDict, Iterable, Annotated
+from functools import lru_cache
+from typing import List, Optional, Tuple, TypedDict, Iterable, Annotated
 import warnings
+from sqlalchemy import Float, bindparam, column
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, text, select
 from openai import OpenAI
+from pgvector.sqlalchemy import HALFVEC
 from pydantic import Field
-from db.schema import Node, TagName, SectionType, ISO3Country, GeoAggregate
+from db.schema import Document, Node, TagName, SectionType, ISO3Country, GeoAggregate
+
+
+_ISO3_VALUES: frozenset[str] = frozenset(c.value for c in ISO3Country)
+
+# ANN search breadth. Filters are applied after the index scan, so a candidate
+# list sized only for top_k can come back short once filtered rows drop out.
+_HNSW_EF_SEARCH_MIN = 40
+_HNSW_EF_SEARCH_MAX = 1000  # pgvector's upper bound for hnsw.ef_search
+_IVFFLAT_PROBES_FILTERED = 10
+
+# is_local=true: like SET LOCAL, reverts when the search transaction ends
+_ANN_SETTINGS_SQL = text(
+    "SELECT set_config('hnsw.ef_search', :ef_search, true), "
+    "set_config('ivfflat.probes', :probes, true)"
+)
 
 
 class SearchResult(TypedDict):
@@ -24,14 +43,123 @@ class ContextResult(TypedDict):
     citation: str
 
 
+@lru_cache(maxsize=4096)
+def _embed_cached(model: str, query: str) -> Tuple[float, ...]:
+    # Tuples, so a caller mutating its result cannot corrupt the cache
+    return tuple(embed_queries([query], model=model)[0])
+
+
 def embed_query(query: str, *, model: str = "text-embedding-3-small") -> List[float]:
+    """Embed a single query, reusing the result for repeated (model, query) pairs."""
+    return list(_embed_cached(model, query))
+
+
+@lru_cache(maxsize=1)
+def _openai_client() -> OpenAI:
+    # Created on first use, not at import, so importing needs no API key.
+    # One client keeps its HTTP connection pool alive across requests.
     # Use your OPENAI_API_KEY in env
-    client = OpenAI()
-    try:
-        emb = client.embeddings.create(model=model, input=query)
-        return emb.data[0].embedding  # List[float]
-    finally:
-        client.close()
+    return OpenAI()
+
+
+def embed_queries(queries: List[str], *, model: str = "text-embedding-3-small") -> List[List[float]]:
+    """Embed several queries with a single API request, in input order."""
+    emb = _openai_client().embeddings.create(model=model, input=queries)
+    return [d.embedding for d in sorted(emb.data, key=lambda d: d.index)]
+
+
+# NOTE: Uses pgvector cosine distance operator in ORDER BY.
+# The query vector is bound once as a pgvector literal and cast once in q,
+# to halfvec to match the column type and its halfvec_cosine_ops index.
+# Every node column is selected so matching Node objects load from this query.
+_SEARCH_SQL = """
+    WITH q AS (SELECT CAST(:qvec AS halfvec(1536)) AS v)
+    SELECT
+    {node_columns},
+    (e.embedding_vector <=> q.v) AS distance
+    FROM embedding e
+    CROSS JOIN q
+    JOIN contentdata cd ON cd.id = e.content_data_id
+    JOIN node n ON n.id = cd.node_id
+    {filter_joins}
+    -- Results report the node's document and publication, so orphans are excluded
+    WHERE n.document_id IS NOT NULL
+    -- dynamic filters below
+    {filters}
+    ORDER BY e.embedding_vector <=> q.v
+    LIMIT :top_k
+"""
+
+
+@lru_cache(maxsize=64)
+def _search_statement(
+    has_documents: bool,
+    has_publications: bool,
+    has_tags: bool,
+    has_sections: bool,
+    has_iso3: bool,
+    has_aggregates: bool,
+):
+    """Build the search statement for one combination of active filters.
+
+    The SQL depends only on which filters are present, not on their values,
+    so each variant is rendered once and reused; values are bound per call.
+    """
+    filters: List[str] = []
+    if has_documents:
+        filters.append("AND n.document_id = ANY(:document_id_arr)")
+    if has_publications:
+        filters.append("AND d.publication_id = ANY(:publication_id_arr)")
+    if has_tags:
+        filters.append("AND n.tag_name = ANY(:tag_name_arr)")
+    if has_sections:
+        filters.append("AND n.section_type = ANY(:section_type_arr)")
+
+    # ?| (array contains any of these strings) can use the GIN indexes on
+    # these paths; see ix_publication_iso3_country_codes in db/schema.py
+    geog_clauses: List[str] = []
+    if has_iso3:
+        geog_clauses.append(
+            "p.publication_metadata->'geographical'->'iso3_country_codes' ?| CAST(:iso3_arr AS text[])"
+        )
+    if has_aggregates:
+        geog_clauses.append(
+            "p.publication_metadata->'geographical'->'aggregates' ?| CAST(:agg_arr AS text[])"
+        )
+    if geog_clauses:
+        filters.append("AND ( " + " OR ".join(geog_clauses) + " )")
+
+    # document and publication are joined only for the filters that read them;
+    # results take publication_id from the node's (already loaded) document
+    filter_joins = ""
+    if has_publications or geog_clauses:
+        filter_joins += "JOIN document d ON d.id = n.document_id"
+    if geog_clauses:
+        filter_joins += " JOIN publication p ON p.id = d.publication_id"
+
+    node_columns = list(Node.__table__.columns)
+    textual = (
+        text(
+            _SEARCH_SQL.format(
+                node_columns=", ".join(f"n.{c.name}" for c in node_columns),
+                filter_joins=filter_joins,
+                filters="\n    ".join(filters),
+            )
+        )
+        .bindparams(bindparam("qvec", type_=HALFVEC(1536)))
+        .columns(*node_columns, column("distance", Float))
+    )
+    # Nodes come straight from the search query; what to_html and get_citation
+    # touch is loaded with one query per relationship instead of per node
+    return (
+        select(Node, textual.selected_columns.distance)
+        .from_statement(textual)
+        .options(
+            selectinload(Node.content_data),
+            selectinload(Node.children),
+            selectinload(Node.document).selectinload(Document.publication),
+        )
+    )
 
 
 # TODO: Replace tag_names and section_types with include and exclude, each a union of TagName and SectionType?
@@ -53,150 +181,89 @@ def semantic_search(
     with Session(engine) as session:
         qvec = embed_query(query_text, model="text-embedding-3-small")
 
-        # NOTE: Uses pgvector cosine distance operator in ORDER BY.
-        # If your column type is `vector`, this works as-is.
-        # If your column is float[] in the DB, adjust migration to vector or cast appropriately.
-        sql = """
-            SELECT
-            e.id AS embedding_id,
-            cd.id AS content_data_id,
-            n.id AS node_id,
-            n.document_id AS document_id,
-            d.publication_id AS publication_id,
-            (e.embedding_vector <=> ((:qvec)::double precision[]::vector(1536))) AS distance
-            FROM embedding e
-            JOIN contentdata cd ON cd.id = e.content_data_id
-            JOIN node n ON n.id = cd.node_id
-            JOIN document d ON d.id = n.document_id
-            LEFT JOIN publication p ON p.id = d.publication_id
-            WHERE 1=1
-            -- dynamic filters below
-            {doc_filter}
-            {pub_filter}
-            {tag_filter}
-            {sect_filter}
-            {geog_filter}
-            ORDER BY e.embedding_vector <=> ((:qvec)::double precision[]::vector(1536))
-            LIMIT :top_k
-        """
-
-        def make_filter(column: str, values: Optional[Iterable]) -> tuple[str, dict]:
-            if values:
-                return f"AND {column} = ANY(:{column}_arr)", {f"{column}_arr": list(values)}
-            return "", {}
-
-        doc_sql, doc_params = make_filter("n.document_id", document_ids)
-        pub_sql, pub_params = make_filter("d.publication_id", publication_ids)
-
-        tag_sql, tag_params = ("", {})
+        document_id_list = list(document_ids) if document_ids else None
+        publication_id_list = list(publication_ids) if publication_ids else None
+
+        valid_tag_values: List[str] = []
         invalid_tag_names: List[str] = []
         if tag_names:
-            valid_tag_values: List[str] = []
             for t in tag_names:
                 if t.lower() in TagName.__members__:
                     valid_tag_values.append(t.lower())
                 else:
                     invalid_tag_names.append(t)
-            if valid_tag_values:
-                tag_sql = "AND n.tag_name = ANY(:tag_name_arr)"
-                tag_params = {"tag_name_arr": valid_tag_values}
 
-        sect_sql, sect_params = ("", {})
+        valid_section_values: List[str] = []
         invalid_section_types: List[str] = []
         if section_types:
-            valid_section_values: List[str] = []
             for s in section_types:
                 if s.upper() in SectionType.__members__:
                     valid_section_values.append(s.upper())
                 else:
                     invalid_section_types.append(s)
-            if valid_section_values:
-                sect_sql = "AND n.section_type = ANY(:section_type_arr)"
-                sect_params = {"section_type_arr": valid_section_values}
 
         # Geography filter: split inputs into ISO3 codes vs aggregates
-        geog_sql, geog_params = ("", {})
+        # Dicts as insertion-ordered sets: deduplicate while preserving order
+        iso3_codes: dict[str, None] = {}
+        aggregates: dict[str, None] = {}
         if geographies:
-            iso3_list: List[str] = []
-            agg_list: List[str] = []
-
-            iso3_values = {c.value for c in ISO3Country}
-
             for g in geographies:
                 value = getattr(g, "value", g)
                 if isinstance(value, str):
-                    if value.upper() in iso3_values:
-                        iso3_list.append(value.upper())
+                    if value.upper() in _ISO3_VALUES:
+                        iso3_codes[value.upper()] = None
                     else:
-                        agg_list.append(value)
-            # Deduplicate preserving order
-            iso3_list = list(dict.fromkeys(iso3_list))
-            agg_list = list(dict.fromkeys(agg_list))
-
-            geog_clauses: List[str] = []
-            if iso3_list:
-                geog_clauses.append(
-                    "EXISTS (\n"
-                    "  SELECT 1 FROM jsonb_array_elements_text(p.publication_metadata->'geographical'->'iso3_country_codes') iso(code)\n"
-                    "  WHERE iso.code = ANY(:iso3_arr)\n"
-                    ")"
-                )
-            if agg_list:
-                geog_clauses.append(
-                    "EXISTS (\n"
-                    "  SELECT 1 FROM jsonb_array_elements_text(p.publication_metadata->'geographical'->'aggregates') agg(val)\n"
-                    "  WHERE agg.val = ANY(:agg_arr)\n"
-                    ")"
-                )
-            if geog_clauses:
-                geog_sql = "AND ( " + " OR ".join(geog_clauses) + " )"
-                if iso3_list:
-                    geog_params["iso3_arr"] = iso3_list
-                if agg_list:
-                    geog_params["agg_arr"] = agg_list
-
-        rendered = sql.format(
-            doc_filter=doc_sql,
-            pub_filter=pub_sql,
-            tag_filter=tag_sql,
-            sect_filter=sect_sql,
-            geog_filter=geog_sql,
+                        aggregates[value] = None
+
+        params = {"qvec": qvec, "top_k": top_k}
+        if document_id_list is not None:
+            params["document_id_arr"] = document_id_list
+        if publication_id_list is not None:
+            params["publication_id_arr"] = publication_id_list
+        if valid_tag_values:
+            params["tag_name_arr"] = valid_tag_values
+        if valid_section_values:
+            params["section_type_arr"] = valid_section_values
+        if iso3_codes:
+            params["iso3_arr"] = list(iso3_codes)
+        if aggregates:
+            params["agg_arr"] = list(aggregates)
+
+        active_filters = (
+            document_id_list is not None,
+            publication_id_list is not None,
+            bool(valid_tag_values),
+            bool(valid_section_values),
+            bool(iso3_codes),
+            bool(aggregates),
+        )
+        stmt = _search_statement(*active_filters)
+
+        filtered = any(active_filters)
+        ef_search = min(_HNSW_EF_SEARCH_MAX, max(_HNSW_EF_SEARCH_MIN, top_k * (4 if filtered else 2)))
+        session.exec(
+            _ANN_SETTINGS_SQL,
+            params={
+                "ef_search": str(ef_search),
+                "probes": str(_IVFFLAT_PROBES_FILTERED if filtered else 1),
+            },
         )
 
-        params = {
-            "qvec": qvec,
-            "top_k": top_k,
-            **doc_params,
-            **pub_params,
-            **tag_params,
-            **sect_params,
-            **geog_params,
-        }
-
-        rows = session.exec(text(rendered), params=params).mappings().all()
-
-        # Load nodes and render HTML
-        node_ids = [r["node_id"] for r in rows]
-        nodes_by_id = {}
-        if node_ids:
-            nodes = session.exec(select(Node).where(Node.id.in_(node_ids))).all()
-            nodes_by_id = {n.id: n for n in nodes}
+        rows = session.exec(stmt, params=params).all()
 
         results: List[SearchResult] = []
-        for r in rows:
-            node = nodes_by_id.get(r["node_id"])
+        for node, distance in rows:
             html = node.to_html(
                 include_citation_data=False,
                 pretty=False,
-            ) if node else ""
-            dist = float(r["distance"])
+            )
             results.append(SearchResult(
-                node_id=int(r["node_id"]),
-                document_id=int(r["document_id"]),
-                publication_id=int(r["publication_id"]) if r["publication_id"] is not None else None,
-                similarity=1.0 - dist,  # cosine distance -> similarity
+                node_id=int(node.id),
+                document_id=int(node.document_id),
+                publication_id=node.document.publication_id,
+                similarity=1.0 - float(distance),  # cosine distance -> similarity
                 html=html,
-                citation=node.get_citation() if node else "",
+                citation=node.get_citation(),
             ))
         if not results:
             warnings.warn("No results found")
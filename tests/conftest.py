@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+from sqlmodel import Session
+
+from db.db import engine
+from db.schema import Document, DocumentType, Publication, SQLModel
+
+
+@pytest.fixture(scope="session", autouse=True)
+def create_tables():
+    # Ensure tables exist; tests may run against a dev DB
+    SQLModel.metadata.create_all(engine)
+
+
+@pytest.fixture
+def db_session():
+    # Each test runs inside one outer transaction that is rolled back afterwards,
+    # so nothing is left behind. The session's own commits and rollbacks only
+    # release or roll back savepoints within it.
+    with engine.connect() as conn:
+        trans = conn.begin()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield session
+        finally:
+            session.close()
+            trans.rollback()
+
+
+def create_pub_doc(session: Session):
+    pub = Publication(
+        title="Test",
+        abstract=None,
+        authors="A. Author",
+        publication_date=date(2024, 1, 1),
+        source="UnitTest",
+        source_url="https://example.com/src",
+        uri="https://example.com/uri",
+    )
+    doc = Document(
+        publication=pub,
+        type=DocumentType.MAIN,
+        download_url="https://example.com/file",
+        description="Doc",
+        mime_type="text/html",
+        charset="utf-8",
+    )
+    session.add(doc)
+    session.commit()
+    session.refresh(doc)
+    return doc
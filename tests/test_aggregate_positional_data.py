@@ -0,0 +1,155 @@
+import json
+import math
+from typing import Any, Dict, List, Set
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+
+from db.schema import Node, TagName
+from migrations.aggregate_positional_data import (
+    AGGREGATE_PREVIEW_SQL,
+    _AGGREGATE_CTES,
+    _aggregate_positional_data_by_page,
+    _iter_target_nodes,
+    _json_equal,
+    _normalize_positional_list,
+    _safe_json_loads,
+)
+from tests.conftest import create_pub_doc
+
+
+AGGREGATED_ROWS_SQL = text(_AGGREGATE_CTES + "\nSELECT id, pd FROM agg")
+
+
+def _bbox(x1: Any, y1: Any, x2: Any, y2: Any) -> Dict[str, Any]:
+    return {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+
+
+# Positional data the SQL path can parse (no string-encoded JSON), covering the
+# shapes found in the wild
+POSITIONAL_DATA_CASES: List[Any] = [
+    None,
+    [],
+    # Already aggregated: one entry per page
+    [{"page_pdf": 1, "page_logical": "i", "bbox": _bbox(10, 20, 30, 40)}],
+    # Several pages, interleaved and out of order
+    [
+        {"page_pdf": 3, "page_logical": "3", "bbox": _bbox(5.5, 6.5, 50.25, 60.75)},
+        {"page_pdf": 2, "page_logical": "2", "bbox": _bbox(1, 2, 3, 4)},
+        {"page_pdf": 3, "page_logical": "3", "bbox": _bbox(0.5, 10, 40, 70.125)},
+        {"page_pdf": 2, "page_logical": "2", "bbox": _bbox(0, 1, 2, 8)},
+    ],
+    # Numeric strings for coordinates and page numbers, including padding and exponents
+    [
+        {"page_pdf": "4", "page_logical": "iv", "bbox": _bbox("10.5", "20", " 30 ", "4e1")},
+        {"page_pdf": 4.0, "page_logical": "iv", "bbox": _bbox(9, "21.25", 31, 39)},
+        {"page_pdf": "5.7", "bbox": _bbox(".5", "-1", "2.", "+3")},
+    ],
+    # Non-numeric coordinates drop the entry; the page survives only with a valid one
+    [
+        {"page_pdf": 6, "page_logical": "bad", "bbox": _bbox("abc", 1, 2, 3)},
+        {"page_pdf": 6, "page_logical": "good", "bbox": _bbox(1, 1, 2, 2)},
+        {"page_pdf": 7, "bbox": _bbox(1, None, 2, 3)},
+        {"page_pdf": 8, "bbox": _bbox(1, 2, "nan", 4)},
+    ],
+    # Missing, null or non-object bboxes and unusable page numbers
+    [
+        {"page_pdf": 9},
+        {"page_pdf": 9, "bbox": None},
+        {"page_pdf": 9, "bbox": [1, 2, 3, 4]},
+        {"page_pdf": None, "bbox": _bbox(1, 2, 3, 4)},
+        {"page_pdf": "x", "bbox": _bbox(1, 2, 3, 4)},
+        {"page_pdf": 10, "bbox": _bbox(1, 2, 3, 4)},
+    ],
+    # page_logical missing on some or all entries of a page
+    [
+        {"page_pdf": 11, "bbox": _bbox(1, 2, 3, 4)},
+        {"page_pdf": 11, "page_logical": None, "bbox": _bbox(0, 0, 1, 1)},
+        {"page_pdf": 11, "page_logical": 12, "bbox": _bbox(2, 2, 5, 5)},
+        {"page_pdf": 12, "bbox": _bbox(1, 2, 3, 4)},
+    ],
+    # A bare object rather than an array
+    {"page_pdf": 14, "bbox": _bbox(1, 2, 3, 4)},
+    # Nothing valid at all
+    [{"page_pdf": 13, "bbox": _bbox("a", "b", "c", "d")}, {"bbox": _bbox(1, 2, 3, 4)}],
+]
+
+
+def _seed_nodes(session: Session) -> int:
+    doc = create_pub_doc(session)
+    nodes = [
+        Node(document=doc, tag_name=TagName.P, sequence_in_parent=i)
+        for i in range(len(POSITIONAL_DATA_CASES))
+    ]
+    session.add_all(nodes)
+    session.flush()
+    conn = session.connection()
+    for node, positional_data in zip(nodes, POSITIONAL_DATA_CASES):
+        # Written as raw jsonb so the stored shapes are exactly the ones above
+        conn.execute(
+            text("UPDATE node SET positional_data = CAST(:pd AS jsonb) WHERE id = :id"),
+            {"pd": None if positional_data is None else json.dumps(positional_data), "id": node.id},
+        )
+    return doc.id
+
+
+def test_sql_aggregation_matches_legacy(db_session: Session):
+    document_id = _seed_nodes(db_session)
+    conn = db_session.connection()
+
+    legacy: Dict[int, List[Dict[str, Any]]] = {}
+    null_ids: Set[int] = set()
+    legacy_updated = legacy_unchanged = 0
+    for node_id, raw in _iter_target_nodes(conn, document_id):
+        if raw is None:
+            null_ids.add(node_id)
+        original = _normalize_positional_list(raw)
+        aggregated = _aggregate_positional_data_by_page(original)
+        legacy[node_id] = aggregated
+        if _json_equal(original, aggregated):
+            legacy_unchanged += 1
+        else:
+            legacy_updated += 1
+
+    sql = {
+        row.id: row.pd
+        for row in conn.execute(AGGREGATED_ROWS_SQL, {"document_id": document_id})
+    }
+    # NULL positional_data is outside the SQL path's target and left as is
+    assert set(sql) == set(legacy) - null_ids
+    for node_id, pd in sql.items():
+        assert pd == legacy[node_id], f"node {node_id}"
+
+    preview = conn.execute(AGGREGATE_PREVIEW_SQL, {"document_id": document_id}).one()
+    assert preview.scanned == len(POSITIONAL_DATA_CASES)
+    assert preview.skipped == 0
+    assert (preview.updated, preview.scanned - preview.updated) == (legacy_updated, legacy_unchanged)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        # Plain JSON takes the orjson path
+        ('{"page_pdf": 1}', {"page_pdf": 1}),
+        ('[{"page_pdf": 1}]', [{"page_pdf": 1}]),
+        ("3", 3),
+        # Double-encoded: a JSON string holding JSON, with or without leading whitespace
+        ('"{\\"page_pdf\\": 1}"', {"page_pdf": 1}),
+        (' \n"[{\\"page_pdf\\": 2}]"', [{"page_pdf": 2}]),
+        # A JSON string whose content is not JSON stays the decoded string
+        ('"page 1"', "page 1"),
+        # Invalid JSON is returned unchanged
+        ("not json", "not json"),
+        ('{"page_pdf": 1', '{"page_pdf": 1'),
+        ("", ""),
+    ],
+)
+def test_safe_json_loads(value, expected):
+    assert _safe_json_loads(value) == expected
+
+
+def test_safe_json_loads_falls_back_to_json_for_lenient_input():
+    # orjson rejects NaN literals; the stdlib json module accepts them
+    result = _safe_json_loads('{"x1": NaN}')
+    assert list(result) == ["x1"] and math.isnan(result["x1"])
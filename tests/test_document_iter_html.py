@@ -0,0 +1,89 @@
+from typing import List
+
+import pytest
+from bs4 import BeautifulSoup
+from sqlmodel import Session
+
+from db.schema import ContentData, Document, EmbeddingSource, Node, TagName
+from tests.conftest import create_pub_doc
+
+
+def _text_node(doc: Document, tag: TagName, seq: int, text: str, **kwargs) -> Node:
+    node = Node(document=doc, tag_name=tag, sequence_in_parent=seq, **kwargs)
+    node.content_data = ContentData(
+        text_content=text, embedding_source=EmbeddingSource.TEXT_CONTENT
+    )
+    return node
+
+
+def _seed_document(session: Session) -> Document:
+    doc = create_pub_doc(session)
+    section = Node(
+        document=doc,
+        tag_name=TagName.SECTION,
+        sequence_in_parent=0,
+        positional_data=[
+            {"page_pdf": 3, "bbox": {"x1": 0, "y1": 0, "x2": 1, "y2": 1}},
+            {"page_pdf": 4, "bbox": {"x1": 0, "y1": 0, "x2": 1, "y2": 1}},
+        ],
+    )
+    section.children = [
+        _text_node(doc, TagName.P, 1, "Body with <em>inline</em> & entities"),
+        _text_node(doc, TagName.H2, 0, "Heading"),
+    ]
+    # Added out of order; an empty root renders nothing and gets no separator
+    session.add_all(
+        [
+            _text_node(doc, TagName.P, 2, "Closing paragraph"),
+            Node(document=doc, tag_name=TagName.P, sequence_in_parent=1),
+            section,
+        ]
+    )
+    session.commit()
+    session.refresh(doc)
+    return doc
+
+
+def _reference_html(doc: Document, separator: str, include_html_wrapper: bool, **kwargs) -> str:
+    # Document.to_html(pretty=False) as it was before rendering was streamed
+    root_nodes: List[Node] = sorted(
+        (n for n in doc.nodes if n.parent_id is None),
+        key=lambda n: n.sequence_in_parent,
+    )
+    parts = [
+        root.to_html(is_top_level=True, separator=separator, pretty=False, **kwargs)
+        for root in root_nodes
+    ]
+    body = separator.join(p for p in parts if p)
+    return f"<html>\n<body>\n{body}\n</body>\n</html>" if include_html_wrapper else body
+
+
+@pytest.mark.parametrize("include_html_wrapper", [False, True])
+@pytest.mark.parametrize("separator", ["\n", ""])
+@pytest.mark.parametrize("include_citation_data", [False, True])
+def test_iter_html_matches_to_html(
+    db_session: Session, include_html_wrapper: bool, separator: str, include_citation_data: bool
+):
+    doc = _seed_document(db_session)
+    options = dict(
+        include_citation_data=include_citation_data,
+        include_node_ids=True,
+        separator=separator,
+        include_html_wrapper=include_html_wrapper,
+    )
+    reference = _reference_html(
+        doc,
+        separator,
+        include_html_wrapper,
+        include_citation_data=include_citation_data,
+        include_node_ids=True,
+    )
+
+    streamed = "".join(doc.iter_html(**options))
+
+    assert "Heading" in streamed and "Closing paragraph" in streamed
+    assert streamed == reference
+    assert doc.to_html(pretty=False, **options) == reference
+    assert doc.to_html(pretty=True, **options) == BeautifulSoup(
+        reference, "html.parser"
+    ).prettify(formatter="html")
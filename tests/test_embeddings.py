@@ -0,0 +1,78 @@
+import numpy as np
+from sqlalchemy import text
+from sqlmodel import Session
+
+from db.embeddings import VECTOR_INDEXES_SQL, bulk_insert_embeddings
+from db.schema import ContentData, EmbeddingSource, Node, TagName
+from tests.conftest import create_pub_doc
+
+
+COLUMN_TYPE_SQL = text(
+    """
+SELECT format_type(a.atttypid, a.atttypmod)
+FROM pg_attribute a
+WHERE a.attrelid = 'embedding'::regclass AND a.attname = 'embedding_vector'
+"""
+)
+
+
+def _create_content_data(session: Session, count: int) -> list[int]:
+    doc = create_pub_doc(session)
+    contents = []
+    for i in range(count):
+        node = Node(document=doc, tag_name=TagName.P, sequence_in_parent=i)
+        contents.append(
+            ContentData(
+                node=node,
+                text_content=f"Paragraph {i}",
+                embedding_source=EmbeddingSource.TEXT_CONTENT,
+            )
+        )
+    session.add_all(contents)
+    session.flush()
+    return [content.id for content in contents]
+
+
+def test_bulk_insert_embeddings_round_trips_and_recreates_indexes(db_session: Session):
+    content_ids = _create_content_data(db_session, 5)
+    conn = db_session.connection()
+
+    # Works against both the vector and halfvec forms of the column
+    column_type = conn.execute(COLUMN_TYPE_SQL).scalar_one()
+    opclass = column_type.split("(")[0] + "_cosine_ops"
+    conn.execute(
+        text(f"CREATE INDEX test_embedding_hnsw ON embedding USING hnsw (embedding_vector {opclass})")
+    )
+    indexes_before = set(conn.execute(VECTOR_INDEXES_SQL).tuples())
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((len(content_ids), 1536))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = ((cid, "test-model", vector) for cid, vector in zip(content_ids, vectors))
+
+    assert bulk_insert_embeddings(conn, rows) == len(content_ids)
+
+    loaded = conn.execute(
+        text(
+            "SELECT content_data_id, model_name, embedding_vector::text FROM embedding "
+            "WHERE content_data_id = ANY(:ids) ORDER BY content_data_id"
+        ),
+        {"ids": content_ids},
+    ).all()
+    assert [row.content_data_id for row in loaded] == content_ids
+    assert all(row.model_name == "test-model" for row in loaded)
+    for row, expected in zip(loaded, vectors):
+        stored = np.array(row.embedding_vector.strip("[]").split(","), dtype=np.float64)
+        # Stored as float32 (vector) or float16 (halfvec)
+        np.testing.assert_allclose(stored, expected, rtol=1e-3, atol=1e-4)
+
+    assert set(conn.execute(VECTOR_INDEXES_SQL).tuples()) == indexes_before
+    assert "test_embedding_hnsw" in {name for name, _ in indexes_before}
+
+
+def test_bulk_insert_embeddings_empty_input_leaves_indexes_alone(db_session: Session):
+    conn = db_session.connection()
+    indexes_before = set(conn.execute(VECTOR_INDEXES_SQL).tuples())
+
+    assert bulk_insert_embeddings(conn, iter(())) == 0
+    assert set(conn.execute(VECTOR_INDEXES_SQL).tuples()) == indexes_before
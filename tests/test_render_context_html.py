@@ -1,53 +1,68 @@
-from typing import Optional, Iterable
-from bs4 import BeautifulSoup
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Iterable
+from sqlalchemy import func
 from sqlmodel import Session, select
 from db.db import engine
 from db.schema import Node, TagName
 
 
-def _first_node_id_for_tag(session: Session, tag: TagName) -> Optional[int]:
-    node_id: Optional[int] = session.exec(
-        select(Node.id).where(Node.tag_name == tag).limit(1)
-    ).first()
-    return node_id
+_OUTER_TAG_RE = re.compile(r"\s*<([A-Za-z][A-Za-z0-9]*)")
 
+# Below the engine's default pool size, so workers never wait for a connection
+_MAX_WORKERS = 8
 
-def _print_context_for_tag(session: Session, tag: TagName) -> None:
-    node_id = _first_node_id_for_tag(session, tag)
-    print(f"\n=== Tag: {tag.value} ===")
+
+def _first_node_ids_by_tag(session: Session) -> Dict[TagName, int]:
+    # One grouped query for every tag instead of a lookup per tag
+    rows = session.exec(select(Node.tag_name, func.min(Node.id)).group_by(Node.tag_name)).all()
+    return {tag: node_id for tag, node_id in rows}
+
+
+def _context_report_for_tag(tag: TagName, node_ids: Dict[TagName, int]) -> str:
+    lines: List[str] = [f"\n=== Tag: {tag.value} ==="]
+    node_id = node_ids.get(tag)
     if node_id is None:
-        print("No node found for this tag; skipping.")
-        return
+        lines.append("No node found for this tag; skipping.")
+        return "\n".join(lines)
 
-    html = Node.render_context_html(session, node_id=node_id, pretty=False)
-    if html is None:
-        print("render_context_html returned None")
-        return
+    # Sessions are not thread-safe, so each worker renders in its own
+    with Session(engine) as session:
+        html = Node.render_context_html(session, node_id=node_id, pretty=False)
+        if html is None:
+            lines.append("render_context_html returned None")
+            return "\n".join(lines)
 
-    # Determine selected container tag by inspecting outermost element
-    soup = BeautifulSoup(html, "html.parser")
-    outer = soup.find(True)
-    selected_container_tag = outer.name if outer is not None else None
+        # Determine selected container tag from the outermost element's start tag;
+        # only its name is needed, so there is no need to parse the whole fragment
+        outer = _OUTER_TAG_RE.match(html)
+        selected_container_tag = outer.group(1).lower() if outer is not None else None
 
-    # Retrieve immediate parent tag of the original node
-    node_obj: Optional[Node] = session.get(Node, node_id)
-    parent_tag = node_obj.parent.tag_name.value if (node_obj and node_obj.parent) else None
+        # Retrieve immediate parent tag of the original node
+        node_obj: Optional[Node] = session.get(Node, node_id)
+        parent_tag = node_obj.parent.tag_name.value if (node_obj and node_obj.parent) else None
 
-    print(f"Node ID: {node_id}")
-    print(f"Rendered length: {len(html)} characters")
-    print(f"Selected container tag: {selected_container_tag}")
-    print(f"Immediate parent tag: {parent_tag}")
+    lines.append(f"Node ID: {node_id}")
+    lines.append(f"Rendered length: {len(html)} characters")
+    lines.append(f"Selected container tag: {selected_container_tag}")
+    lines.append(f"Immediate parent tag: {parent_tag}")
+    return "\n".join(lines)
 
 
-def _run_for_tags(session: Session, tags: Iterable[TagName]) -> None:
-    for tag in tags:
-        _print_context_for_tag(session, tag)
+def _run_for_tags(pool: ThreadPoolExecutor, tags: Iterable[TagName], node_ids: Dict[TagName, int]) -> None:
+    # Renders are independent and mostly wait on the database, so they overlap
+    # across threads; map() still yields the reports in tag order
+    for report in pool.map(lambda tag: _context_report_for_tag(tag, node_ids), tags):
+        print(report)
 
 
 if __name__ == "__main__":
     with Session(engine) as session:
+        node_ids = _first_node_ids_by_tag(session)
+
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
         # Table family
-        _run_for_tags(session, [
+        _run_for_tags(pool, [
             TagName.TABLE,
             TagName.THEAD,
             TagName.TBODY,
@@ -56,31 +71,31 @@ if __name__ == "__main__":
             TagName.TH,
             TagName.TD,
             TagName.CAPTION,
-        ])
+        ], node_ids)
 
         # Figure family
-        _run_for_tags(session, [
+        _run_for_tags(pool, [
             TagName.FIGURE,
             TagName.FIGCAPTION,
             TagName.IMG,
-        ])
+        ], node_ids)
 
         # Lists
-        _run_for_tags(session, [
+        _run_for_tags(pool, [
             TagName.UL,
             TagName.OL,
             TagName.LI,
-        ])
+        ], node_ids)
 
         # Common containers
-        _run_for_tags(session, [
+        _run_for_tags(pool, [
             TagName.SECTION,
             TagName.ASIDE,
             TagName.NAV,
-        ])
+        ], node_ids)
 
         # Text-ish nodes
-        _run_for_tags(session, [
+        _run_for_tags(pool, [
             TagName.P,
             TagName.H1,
             TagName.H2,
@@ -91,4 +106,4 @@ if __name__ == "__main__":
             TagName.CODE,
             TagName.CITE,
             TagName.BLOCKQUOTE,
-        ])
+        ], node_ids)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+
+import db.db
+import services.semantic_search
+from db.schema import ContentData, Embedding, EmbeddingSource, Node, TagName
+from services.semantic_search import semantic_search
+from tests.conftest import create_pub_doc
+
+
+def _node_with_embedding(session: Session, document, vector: list[float]) -> Node:
+    node = Node(document=document, tag_name=TagName.P, sequence_in_parent=0)
+    content = ContentData(
+        node=node,
+        text_content="Coastal flood risk",
+        embedding_source=EmbeddingSource.TEXT_CONTENT,
+    )
+    session.add(Embedding(content_data=content, embedding_vector=vector, model_name="test-model"))
+    return node
+
+
+def test_semantic_search_skips_nodes_without_a_document(db_session: Session, monkeypatch):
+    conn = db_session.connection()
+    if conn.execute(text("SELECT to_regtype('halfvec')")).scalar() is None:
+        pytest.skip("search casts to halfvec, which needs pgvector >= 0.7")
+
+    rng = np.random.default_rng(0)
+    vector = rng.standard_normal(1536)
+    vector = (vector / np.linalg.norm(vector)).tolist()
+
+    # Both nodes share the query vector, so they rank ahead of anything else in the table
+    orphan = _node_with_embedding(db_session, None, vector)
+    attached = _node_with_embedding(db_session, create_pub_doc(db_session), vector)
+    db_session.commit()
+
+    monkeypatch.setattr(services.semantic_search, "embed_query", lambda *args, **kwargs: vector)
+    monkeypatch.setattr(db.db, "engine", conn)
+
+    for kwargs in ({}, {"document_ids": [attached.document_id]}):
+        results = semantic_search("coastal flooding", top_k=5, **kwargs)
+        node_ids = [r["node_id"] for r in results]
+        assert orphan.id not in node_ids
+        assert attached.id in node_ids
@@ -8,6 +8,10 @@ from db.db import engine
 from db.schema import Document, Node
 
 
+_DEFAULT_DOCUMENT_OUTPUT = Path("tests/out/document.html")
+_DEFAULT_NODE_OUTPUT = Path("tests/out/node.html")
+
+
 def export_document_html(
     *,
     document_id: Optional[int],
@@ -16,6 +20,7 @@ def export_document_html(
     include_citation_data: bool,
     include_node_ids: bool,
 ) -> Path:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
     with Session(engine) as session:
         if document_id is not None:
             stmt = select(Document).where(Document.id == document_id)
@@ -28,15 +33,25 @@ def export_document_html(
         if document is None:
             raise SystemExit("No Document found. Populate the database before running this script.")
 
-        html_text: str = document.to_html(
-            include_citation_data=include_citation_data,
-            include_node_ids=include_node_ids,
-            include_html_wrapper=True,
-            pretty=pretty,
-        )
-
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html_text, encoding="utf-8")
+        if pretty:
+            # Prettifying re-parses the whole document, so it has to be built in full
+            html_text: str = document.to_html(
+                include_citation_data=include_citation_data,
+                include_node_ids=include_node_ids,
+                include_html_wrapper=True,
+                pretty=True,
+            )
+            output_path.write_text(html_text, encoding="utf-8")
+        else:
+            # Stream root-node fragments to the file as they are rendered
+            with output_path.open("w", encoding="utf-8") as f:
+                f.writelines(
+                    document.iter_html(
+                        include_citation_data=include_citation_data,
+                        include_node_ids=include_node_ids,
+                        include_html_wrapper=True,
+                    )
+                )
     return output_path
 
 
@@ -72,7 +87,7 @@ def export_node_html(
     return output_path
 
 
-def main() -> None:
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Export a Document or a Node rendered as HTML for inspection."
     )
@@ -91,7 +106,7 @@ def main() -> None:
     parser.add_argument(
         "--output",
         type=Path,
-        default=Path("tests/out/document.html"),
+        default=_DEFAULT_DOCUMENT_OUTPUT,
         help="Output file path.",
     )
     parser.add_argument(
@@ -105,17 +120,28 @@ def main() -> None:
         action="store_true",
         help="Include publication and document data attributes on top-level elements.",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--no-pretty",
+        action="store_true",
+        help="Write compact HTML without prettifying; documents are streamed to the file.",
+    )
+    return parser
+
+
+_PARSER = _build_parser()
+
+
+def main() -> None:
+    args = _PARSER.parse_args()
 
     # Determine mode: Node takes precedence if provided
     if args.node_id is not None:
         # If default document output is unchanged, switch to a node-specific default
-        default_doc_output = Path("tests/out/document.html")
-        output_path = args.output if args.output != default_doc_output else Path("tests/out/node.html")
+        output_path = args.output if args.output != _DEFAULT_DOCUMENT_OUTPUT else _DEFAULT_NODE_OUTPUT
         output_path = export_node_html(
             node_id=args.node_id,
             output_path=output_path,
-            pretty=True,
+            pretty=not args.no_pretty,
             include_citation_data=args.citation,
             include_node_ids=args.include_ids,
         )
@@ -124,7 +150,7 @@ def main() -> None:
         output_path = export_document_html(
             document_id=args.document_id,
             output_path=args.output,
-            pretty=True,
+            pretty=not args.no_pretty,
             include_citation_data=args.citation,
             include_node_ids=args.include_ids,
         )
@@ -0,0 +1,66 @@
+import threading
+from typing import List
+
+from psycopg.errors import UniqueViolation
+from sqlalchemy import text
+
+from db.db import engine
+from migrations.upload_to_prod import _copy_rows, _estimate_rows
+
+
+def test_copy_rows_raises_on_server_error_instead_of_hanging():
+    # Three rows with id=1 into a primary key: the unique violation is only
+    # reported when the COPY block exits, after the reader's sentinel is consumed
+    errors: List[BaseException] = []
+
+    with engine.connect() as local_conn, engine.connect() as prod_conn:
+        prod_conn.execute(text("CREATE TEMP TABLE tmp_copy_dupes (id integer PRIMARY KEY)"))
+
+        def run() -> None:
+            try:
+                _copy_rows(
+                    local_conn,
+                    prod_conn,
+                    "SELECT 1::integer AS id FROM generate_series(1, 3)",
+                    "tmp_copy_dupes",
+                    ("id",),
+                )
+            except BaseException as exc:
+                errors.append(exc)
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        worker.join(timeout=30)
+
+        assert not worker.is_alive(), "_copy_rows did not return after a server-side COPY error"
+        assert len(errors) == 1
+        assert isinstance(errors[0], UniqueViolation)
+        prod_conn.rollback()
+
+
+def test_copy_rows_copies_all_rows():
+    with engine.connect() as local_conn, engine.connect() as prod_conn:
+        prod_conn.execute(text("CREATE TEMP TABLE tmp_copy_ok (id integer PRIMARY KEY)"))
+        _copy_rows(
+            local_conn,
+            prod_conn,
+            "SELECT g::integer AS id FROM generate_series(1, 1000) AS g",
+            "tmp_copy_ok",
+            ("id",),
+        )
+        assert prod_conn.execute(text("SELECT COUNT(*), SUM(id) FROM tmp_copy_ok")).one() == (1000, 500500)
+        prod_conn.rollback()
+
+
+def test_estimate_rows_reports_unknown_for_never_analyzed_tables():
+    with engine.connect() as conn:
+        # pg_class.reltuples is -1 until the first ANALYZE
+        conn.execute(text("CREATE TABLE public.tmp_never_analyzed (id integer)"))
+        conn.execute(text("CREATE TABLE public.tmp_analyzed (id integer)"))
+        conn.execute(text("INSERT INTO public.tmp_analyzed SELECT generate_series(1, 10)"))
+        conn.execute(text("ANALYZE public.tmp_analyzed"))
+        assert _estimate_rows(conn, ("tmp_never_analyzed", "tmp_analyzed")) == {
+            "tmp_never_analyzed": "unknown",
+            "tmp_analyzed": "~10",
+        }
+        conn.rollback()